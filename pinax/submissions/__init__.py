@@ -1,3 +1,5 @@
 import pkg_resources
 
 __version__ = pkg_resources.get_distribution("pinax-submissions").version
+
+default_app_config = "pinax.submissions.apps.AppConfig"
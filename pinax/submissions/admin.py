@@ -1,6 +1,13 @@
 from django.contrib import admin
 
-from .models import NotificationTemplate, SubmissionKind, SubmissionResult
+from .models import (
+    NotificationTemplate,
+    QueuedEmail,
+    ReviewerStats,
+    SubmissionKind,
+    SubmissionResult,
+    SubmissionResultLog,
+)
 
 admin.site.register(
     NotificationTemplate,
@@ -15,3 +22,24 @@ admin.site.register(
     list_display=["submission", "status", "accepted"]
 )
 admin.site.register(SubmissionKind)
+admin.site.register(
+    QueuedEmail,
+    list_display=["subject", "to", "status", "attempts", "created_at", "sent_at"],
+    list_filter=["status"]
+)
+admin.site.register(
+    SubmissionResultLog,
+    list_display=["submission", "old_status", "new_status", "user", "timestamp"],
+    list_filter=["new_status"]
+)
+admin.site.register(
+    ReviewerStats,
+    list_display=[
+        "user",
+        "assignment_count",
+        "review_count",
+        "outstanding_count",
+        "opt_out_count",
+        "average_turnaround",
+    ]
+)
@@ -0,0 +1,14 @@
+import importlib
+
+from django.apps import AppConfig as BaseAppConfig
+from django.utils.translation import ugettext_lazy as _
+
+
+class AppConfig(BaseAppConfig):
+
+    name = "pinax.submissions"
+    label = "submissions"
+    verbose_name = _("Pinax Submissions")
+
+    def ready(self):
+        importlib.import_module("pinax.submissions.receivers")
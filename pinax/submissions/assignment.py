@@ -0,0 +1,129 @@
+import heapq
+import random
+from collections import Counter
+
+
+class AssignmentState:
+    """
+    In-memory view of the existing review assignments: each reviewer's
+    load (overall and per kind), each submission's number of active
+    reviewers and the (submission, reviewer) pairs that can't be assigned
+    again, opt-outs included.
+
+    Build it with ``from_loads``, from just the rows the submissions being
+    assigned need.
+    """
+
+    def __init__(self):
+        self.load = Counter()
+        self.kind_load = Counter()
+        self.active = Counter()
+        self.taken = set()
+        # bumped on every change to a reviewer's load, to spot stale heap entries
+        self.version = Counter()
+
+    @classmethod
+    def from_loads(cls, loads, assignments):
+        """
+        Build the state from just what assigning some submissions needs:
+        ``(user_id, kind_id, count)`` active assignment counts of the
+        reviewers in their pools and the ``(submission_id, user_id,
+        opted_out)`` assignments of the submissions themselves.
+        """
+        state = cls()
+        for user_id, kind_id, count in loads:
+            state.load[user_id] += count
+            state.kind_load[user_id, kind_id] += count
+        for submission_id, user_id, opted_out in assignments:
+            state.taken.add((submission_id, user_id))
+            if not opted_out:
+                state.active[submission_id] += 1
+        return state
+
+    def add(self, submission, user_id):
+        self.taken.add((submission.pk, user_id))
+        self.load[user_id] += 1
+        self.kind_load[user_id, submission.kind_id] += 1
+        self.active[submission.pk] += 1
+        self.version[user_id] += 1
+
+
+class AssignmentStrategy:
+    """
+    Decides which reviewers to assign to which submissions.
+
+    ``assign`` gets the submissions, a mapping of ``SubmissionKind`` pk to
+    the pks of the reviewers in that kind's pool and an ``AssignmentState``,
+    and returns ``(submission, user_pk)`` pairs, updating the state as it
+    goes.
+    """
+
+    def __init__(self, num_reviewers, weight=None, conflicts=None):
+        self.num_reviewers = num_reviewers
+        self.weight = weight or (lambda kind_id, user_id: 1)
+        self.conflicts = conflicts or (lambda submission: set())
+
+    def assign(self, submissions, pools, state):
+        raise NotImplementedError()
+
+
+class BalancedAssignmentStrategy(AssignmentStrategy):
+    """
+    Greedy min-cost assignment: every submission gets the reviewers from
+    its kind's pool with the lowest weighted load, ties going to whoever
+    has been assigned the fewest submissions of that kind and then at random.
+
+    Each pool is a heap keyed on the cost of one more assignment, so the
+    whole call is assigned in O((S * R + P) log P) for S submissions, R
+    reviewers per submission and P pool members. Reviewers sit in the heaps
+    of several kinds; entries that went stale because the reviewer was
+    assigned from another pool are refreshed lazily when popped.
+    """
+
+    def assign(self, submissions, pools, state):
+        heaps = {}
+        weights = {}
+        pairs = []
+        for submission in submissions:
+            needed = self.num_reviewers - state.active[submission.pk]
+            if needed <= 0:
+                continue
+            if submission.kind_id not in heaps:
+                # reviewers with no weight for a kind are left out of its pool
+                for user_id in pools.get(submission.kind_id, []):
+                    weights[submission.kind_id, user_id] = self.weight(submission.kind_id, user_id)
+                heaps[submission.kind_id] = [
+                    self.entry(submission.kind_id, user_id, state, weights)
+                    for user_id in pools.get(submission.kind_id, [])
+                    if weights[submission.kind_id, user_id] > 0
+                ]
+                heapq.heapify(heaps[submission.kind_id])
+            heap = heaps[submission.kind_id]
+            excluded = self.conflicts(submission)
+            skipped = []
+            while needed > 0 and heap:
+                entry = heapq.heappop(heap)
+                user_id, version = entry[-2:]
+                if version != state.version[user_id]:
+                    heapq.heappush(heap, self.entry(submission.kind_id, user_id, state, weights))
+                    continue
+                if user_id in excluded or (submission.pk, user_id) in state.taken:
+                    skipped.append(entry)
+                    continue
+                state.add(submission, user_id)
+                pairs.append((submission, user_id))
+                heapq.heappush(heap, self.entry(submission.kind_id, user_id, state, weights))
+                needed -= 1
+            for entry in skipped:
+                heapq.heappush(heap, entry)
+        return pairs
+
+    def entry(self, kind_id, user_id, state, weights):
+        cost = (state.load[user_id] + 1) / weights[kind_id, user_id]
+        return (
+            cost,
+            state.kind_load[user_id, kind_id],
+            random.random(),
+            user_id,
+            state.version[user_id],
+        )
@@ -2,3 +2,8 @@ try:
     from account.decorators import login_required
 except ImportError:
     from django.contrib.auth.decorators import login_required  # noqa
+
+try:
+    from django.utils.http import url_has_allowed_host_and_scheme
+except ImportError:
+    from django.utils.http import is_safe_url as url_has_allowed_host_and_scheme  # noqa
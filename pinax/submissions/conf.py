@@ -24,11 +24,45 @@ class PinaxPagesAppConf(AppConf):
 
     HOOKSET = "pinax.submissions.hooks.DefaultHookSet"
     MARKUP_RENDERER = "markdown.markdown"
+    MARKUP_CACHE = "default"
+    MARKUP_CACHE_TIMEOUT = 60 * 60 * 24 * 30
+    PERMISSIONS_CACHE = "default"
+    PERMISSIONS_CACHE_TIMEOUT = 60 * 60
+    CAPABILITIES_IN_SESSION = False
     FORMS = {}
+    PAGE_SIZE = 50
+    EMAIL_QUEUE = False
+    EMAIL_BATCH_SIZE = 100
+    EMAIL_MAX_ATTEMPTS = 5
+    EMAIL_RETRY_DELAY = 60
+    EMAIL_CLAIM_TIMEOUT = 10 * 60
+    NOTIFICATION_CHUNK_SIZE = 500
+    EXPORT_CHUNK_SIZE = 500
+    DOCUMENT_BACKEND = None
+    DOCUMENT_ARCHIVE_MAX_FILE_SIZE = 100 * 1024 * 1024
+    FRAGMENT_CACHE = "default"
+    SEARCH_BACKEND = None
+    SEARCH_CACHE = "default"
+    SEARCH_LIMIT = 100
 
     def configure_markup_renderer(self, value):
         return load_path_attr(value)
 
+    def configure_document_backend(self, value):
+        if value is None:
+            # honour the setting this app used before backends were pluggable
+            if getattr(settings, "USE_X_ACCEL_REDIRECT", False):
+                value = "pinax.submissions.documents.XAccelRedirectBackend"
+            else:
+                value = "pinax.submissions.documents.FileResponseBackend"
+        return load_path_attr(value)()
+
+    def configure_search_backend(self, value):
+        # None picks the best backend the database supports on first use
+        if value is None:
+            return None
+        return load_path_attr(value)()
+
     def configure_hookset(self, value):
         return load_path_attr(value)()
 
@@ -0,0 +1,224 @@
+import hashlib
+import os
+import re
+import zipfile
+
+from django.http import FileResponse, Http404, HttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+
+RANGE_RE = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+
+class FileRange:
+    """
+    A read-only view of ``length`` bytes of ``file`` starting at ``start``.
+
+    It keeps ``fileno()`` and leaves the file positioned at ``start``, so
+    WSGI servers whose ``wsgi.file_wrapper`` uses ``sendfile`` (sending
+    ``Content-Length`` bytes from the current offset) still can.
+    """
+
+    def __init__(self, file, start, length):
+        self.file = file
+        self.file.seek(start)
+        self.remaining = length
+
+    def read(self, size=-1):
+        if self.remaining <= 0:
+            return b""
+        if size < 0 or size > self.remaining:
+            size = self.remaining
+        data = self.file.read(size)
+        self.remaining -= len(data)
+        return data
+
+    def fileno(self):
+        return self.file.fileno()
+
+    def tell(self):
+        return self.file.tell()
+
+    def close(self):
+        self.file.close()
+
+
+class DocumentBackend:
+    """
+    Turns a ``SupportingDocument`` into the response that delivers it.
+    """
+
+    def serve(self, request, document):
+        raise NotImplementedError()
+
+    def filename(self, document):
+        return os.path.basename(document.document.name)
+
+
+class XAccelRedirectBackend(DocumentBackend):
+    """
+    Hands the file over to nginx with an ``X-Accel-Redirect`` to the
+    document's URL, which should point at an ``internal`` location.
+    """
+
+    def serve(self, request, document):
+        response = HttpResponse()
+        response["X-Accel-Redirect"] = document.document.url
+        del response["Content-Type"]
+        return response
+
+
+class XSendfileBackend(DocumentBackend):
+    """
+    Hands the file over to Apache's mod_xsendfile, lighttpd or any other
+    server honouring the ``X-Sendfile`` header with its path on disk.
+    """
+
+    def serve(self, request, document):
+        response = HttpResponse()
+        response["X-Sendfile"] = document.document.path
+        del response["Content-Type"]
+        return response
+
+
+class FileResponseBackend(DocumentBackend):
+    """
+    Serves the file from Django with a ``FileResponse``, so the WSGI server
+    can use ``sendfile``, supporting single ``Range`` requests and
+    conditional requests through ``ETag``/``If-None-Match`` and
+    ``Last-Modified``/``If-Modified-Since``.
+    """
+
+    def etag(self, document, size, modified):
+        value = f"{document.document.name}:{size}:{modified.timestamp()}"
+        return quote_etag(hashlib.sha1(value.encode()).hexdigest())
+
+    def modified_time(self, document):
+        try:
+            return document.document.storage.get_modified_time(document.document.name)
+        except NotImplementedError:
+            return document.created_at
+
+    def parse_range(self, header, size):
+        """
+        Return the ``(start, end)`` of a single byte range, ``None`` to
+        serve the whole file or ``False`` if the range can't be satisfied.
+        """
+        match = RANGE_RE.match(header.strip())
+        if not match or not any(match.groups()):
+            return None
+        first, last = match.groups()
+        if first:
+            start = int(first)
+            end = min(int(last), size - 1) if last else size - 1
+        else:
+            start, end = max(size - int(last), 0), size - 1
+        if start > end or start >= size:
+            return False
+        return start, end
+
+    def serve(self, request, document):
+        storage = document.document.storage
+        try:
+            size = storage.size(document.document.name)
+            modified = self.modified_time(document)
+        except OSError:
+            # FileNotFoundError included: the file is missing from storage
+            raise Http404()
+        etag = self.etag(document, size, modified)
+        last_modified = int(modified.timestamp())
+
+        response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+        if response is not None:
+            return response
+
+        byte_range = None
+        header = request.META.get("HTTP_RANGE")
+        if header and request.META.get("HTTP_IF_RANGE", etag) == etag:
+            byte_range = self.parse_range(header, size)
+        if byte_range is False:
+            response = HttpResponse(status=416)
+            response["Content-Range"] = f"bytes */{size}"
+            return response
+
+        try:
+            file = storage.open(document.document.name, "rb")
+        except OSError:
+            raise Http404()
+        if byte_range:
+            start, end = byte_range
+            response = FileResponse(FileRange(file, start, end - start + 1), filename=self.filename(document))
+            response.status_code = 206
+            response["Content-Length"] = str(end - start + 1)
+            response["Content-Range"] = f"bytes {start}-{end}/{size}"
+        else:
+            response = FileResponse(file, filename=self.filename(document))
+            response["Content-Length"] = str(size)
+        response["Accept-Ranges"] = "bytes"
+        response["ETag"] = etag
+        response["Last-Modified"] = http_date(last_modified)
+        return response
+
+
+class ZipStream:
+    """
+    An unseekable file-like object collecting what ``zipfile`` writes to it
+    until it is drained, so an archive can be streamed as it is built.
+    """
+
+    def __init__(self):
+        self.chunks = []
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b"".join(self.chunks)
+        self.chunks = []
+        return data
+
+
+def archive_name(document):
+    return f"{document.submission.number}/{os.path.basename(document.document.name)}"
+
+
+def stream_archive(documents, max_file_size=None, chunk_size=64 * 1024):
+    """
+    Yield a ZIP archive of ``documents`` piece by piece.
+
+    Files are read ``chunk_size`` bytes at a time and each compressed chunk
+    is yielded as soon as it is written, so neither the archive nor any
+    file is held in memory. Files larger than ``max_file_size`` or missing
+    from storage are left out and listed in ``SKIPPED.txt``.
+    """
+    stream = ZipStream()
+    skipped = []
+    with zipfile.ZipFile(stream, mode="w", compression=zipfile.ZIP_DEFLATED) as archive:
+        for document in documents:
+            name = archive_name(document)
+            storage = document.document.storage
+            try:
+                size = storage.size(document.document.name)
+            except OSError:
+                skipped.append(f"{name}: missing")
+                continue
+            if max_file_size is not None and size > max_file_size:
+                skipped.append(f"{name}: {size} bytes is over the {max_file_size} byte limit")
+                continue
+            info = zipfile.ZipInfo(name, date_time=document.created_at.timetuple()[:6])
+            info.compress_type = zipfile.ZIP_DEFLATED
+            # lets zipfile decide up front whether the entry needs ZIP64
+            info.file_size = size
+            with storage.open(document.document.name, "rb") as source:
+                with archive.open(info, mode="w") as target:
+                    for chunk in iter(lambda: source.read(chunk_size), b""):
+                        target.write(chunk)
+                        yield stream.drain()
+            yield stream.drain()
+        if skipped:
+            archive.writestr("SKIPPED.txt", "\n".join(skipped) + "\n")
+    yield stream.drain()
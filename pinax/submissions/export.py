@@ -0,0 +1,115 @@
+import csv
+import itertools
+import json
+from collections import defaultdict
+
+from django.apps import apps
+from django.core.serializers.json import DjangoJSONEncoder
+
+from .models import Review, SubmissionBase
+
+COLUMNS = [
+    "id",
+    "kind",
+    "submitter",
+    "submitted",
+    "cancelled",
+    "status",
+    "review_count",
+]
+
+
+def submission_fields():
+    """
+    The names of the fields added by the concrete ``SubmissionBase``
+    subclasses, in a stable order, so every row has the same columns.
+    """
+    names = []
+    for model in apps.get_models():
+        if issubclass(model, SubmissionBase) and model is not SubmissionBase:
+            for field in model._meta.concrete_fields:
+                if field.model is model and not field.primary_key and field.attname not in names:
+                    names.append(field.attname)
+    return names
+
+
+def export_rows(submissions=None, chunk_size=500):
+    """
+    Yield a dict per submission with its kind, status, review count and
+    reviews, plus the fields of its concrete subclass.
+
+    Submissions are read with ``iterator(chunk_size)`` and their reviews
+    fetched one chunk at a time, so memory use doesn't grow with the number
+    of submissions.
+    """
+    if submissions is None:
+        submissions = SubmissionBase.objects.all()
+    submissions = submissions.select_related("kind", "submitter", "result").select_subclasses().order_by("pk")
+    fields = submission_fields()
+    rows = submissions.iterator(chunk_size=chunk_size)
+    while True:
+        chunk = list(itertools.islice(rows, chunk_size))
+        if not chunk:
+            break
+        reviews = defaultdict(list)
+        queryset = Review.objects.filter(
+            submission__in=[submission.pk for submission in chunk]
+        ).select_related("user").order_by("submitted_at", "pk")
+        for review in queryset:
+            reviews[review.submission_id].append({
+                "user": review.user.get_username(),
+                "comment": review.comment,
+                "submitted_at": review.submitted_at,
+            })
+        for submission in chunk:
+            row = {
+                "id": submission.pk,
+                "kind": submission.kind.name,
+                "submitter": submission.submitter.get_username(),
+                "submitted": submission.submitted,
+                "cancelled": submission.cancelled,
+                "status": getattr(getattr(submission, "result", None), "status", "undecided"),
+                "review_count": len(reviews[submission.pk]),
+            }
+            for name in fields:
+                row[name] = getattr(submission, name, None)
+            row["reviews"] = reviews[submission.pk]
+            yield row
+
+
+class Echo:
+    """
+    A file-like object that hands back what is written to it, so
+    ``csv.writer`` can be used to produce lines for a generator.
+    """
+
+    def write(self, value):
+        return value
+
+
+def export_csv(rows):
+    """
+    Yield ``rows`` as CSV lines, with the reviews joined into one column.
+    """
+    writer = csv.writer(Echo())
+    header = COLUMNS + submission_fields()
+    yield writer.writerow(header + ["reviews"])
+    for row in rows:
+        reviews = "\n\n".join(
+            f"{review['user']}: {review['comment']}" for review in row["reviews"]
+        )
+        yield writer.writerow([row[name] for name in header] + [reviews])
+
+
+def export_ndjson(rows):
+    """
+    Yield ``rows`` as newline-delimited JSON.
+    """
+    for row in rows:
+        yield json.dumps(row, cls=DjangoJSONEncoder) + "\n"
+
+
+FORMATS = {
+    "csv": ("text/csv", export_csv),
+    "ndjson": ("application/x-ndjson", export_ndjson),
+}
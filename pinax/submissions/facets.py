@@ -0,0 +1,247 @@
+from django.contrib.auth import get_user_model
+from django.db import models
+from django.db.models import Case, Count, F, OuterRef, Value, When
+from django.db.models.functions import Cast, Coalesce
+from django.utils.http import urlencode
+from django.utils.translation import ugettext_lazy as _
+
+from .models import Review, ReviewAssignment, SubmissionKind, SubqueryCount
+
+
+def text(expression):
+    return Cast(expression, output_field=models.CharField())
+
+
+class Facet:
+    """
+    One way of narrowing down a list of submissions, by any of the values
+    selected for it in the query string parameter ``name``.
+    """
+
+    label = None
+
+    def __init__(self, name):
+        self.name = name
+
+    def clean(self, values):
+        """
+        The ``values`` that are among this facet's choices; the others are
+        ignored rather than matching nothing.
+        """
+        return values
+
+    def prepare(self, queryset):
+        """
+        Add the annotations ``value`` refers to.
+        """
+        return queryset
+
+    def filter(self, queryset, values):
+        raise NotImplementedError()
+
+    def counts(self, queryset):
+        """
+        ``queryset`` grouped by this facet's value, as the ``facet``,
+        ``value``, ``label`` and ``count`` of each group.
+        """
+        return queryset.values(
+            facet=Value(self.name, output_field=models.CharField()),
+            value=self.value(),
+            label=self.value(),
+        ).annotate(count=Count("pk", distinct=True)).order_by()
+
+    def value(self):
+        raise NotImplementedError()
+
+    def choices(self, groups):
+        return sorted(groups)
+
+
+class KindFacet(Facet):
+
+    label = _("Kind")
+
+    def clean(self, values):
+        if not values:
+            return values
+        slugs = set(SubmissionKind.objects.filter(slug__in=values).values_list("slug", flat=True))
+        return [value for value in values if value in slugs]
+
+    def filter(self, queryset, values):
+        return queryset.filter(kind__slug__in=values)
+
+    def counts(self, queryset):
+        return queryset.values(
+            facet=Value(self.name, output_field=models.CharField()),
+            value=F("kind__slug"),
+            label=F("kind__name"),
+        ).annotate(count=Count("pk", distinct=True)).order_by()
+
+    def choices(self, groups):
+        return sorted(groups, key=lambda group: group[1])
+
+
+class StatusFacet(Facet):
+
+    label = _("Status")
+    statuses = ["undecided", "accepted", "rejected", "standby"]
+
+    def clean(self, values):
+        return [value for value in values if value in self.statuses]
+
+    def value(self):
+        # submissions without a result are undecided
+        return Coalesce("result__status", Value("undecided"))
+
+    def filter(self, queryset, values):
+        return queryset.annotate(facet_status=self.value()).filter(facet_status__in=values)
+
+    def choices(self, groups):
+        return sorted(groups, key=lambda group: self.statuses.index(group[0]))
+
+
+class CancelledFacet(Facet):
+
+    label = _("Cancelled")
+
+    def clean(self, values):
+        return [value for value in values if value in ("yes", "no")]
+
+    def value(self):
+        return Case(When(cancelled=True, then=Value("yes")), default=Value("no"), output_field=models.CharField())
+
+    def filter(self, queryset, values):
+        return queryset.filter(cancelled__in={value == "yes" for value in values})
+
+
+class ReviewCountFacet(Facet):
+    """
+    Buckets submissions by how many reviews they have.
+    """
+
+    label = _("Reviews")
+    buckets = [
+        ("0", 0, 0),
+        ("1-2", 1, 2),
+        ("3+", 3, None),
+    ]
+
+    def clean(self, values):
+        names = {name for name, low, high in self.buckets}
+        return [value for value in values if value in names]
+
+    def prepare(self, queryset):
+        reviews = Review.objects.filter(submission=OuterRef("pk")).order_by().values("pk")
+        return queryset.annotate(facet_review_count=Coalesce(SubqueryCount(reviews), 0))
+
+    def value(self):
+        whens = [
+            When(facet_review_count__lte=high, then=Value(name))
+            for name, low, high in self.buckets if high is not None
+        ]
+        return Case(*whens, default=Value(self.buckets[-1][0]), output_field=models.CharField())
+
+    def filter(self, queryset, values):
+        return self.prepare(queryset).annotate(facet_review_bucket=self.value()).filter(facet_review_bucket__in=values)
+
+    def choices(self, groups):
+        names = [name for name, low, high in self.buckets]
+        return sorted(groups, key=lambda group: names.index(group[0]))
+
+
+class ReviewerFacet(Facet):
+    """
+    The reviewers actively assigned to submissions.
+    """
+
+    label = _("Assigned reviewer")
+
+    def clean(self, values):
+        values = [value for value in values if value.isdigit()]
+        if not values:
+            return values
+        users = set(get_user_model().objects.filter(pk__in=values).values_list("pk", flat=True))
+        return [value for value in values if int(value) in users]
+
+    def filter(self, queryset, values):
+        # uncorrelated, so it is run once rather than probed per submission
+        return queryset.filter(pk__in=ReviewAssignment.objects.filter(
+            user__in=values,
+            opted_out=False,
+        ).values("submission_id"))
+
+    def counts(self, queryset):
+        return queryset.filter(reviewassignment__opted_out=False).values(
+            facet=Value(self.name, output_field=models.CharField()),
+            value=text("reviewassignment__user_id"),
+            label=F(f"reviewassignment__user__{get_user_model().USERNAME_FIELD}"),
+        ).annotate(count=Count("pk", distinct=True)).order_by()
+
+    def choices(self, groups):
+        return sorted(groups, key=lambda group: group[1])
+
+
+FACETS = [
+    KindFacet("kind"),
+    StatusFacet("status"),
+    CancelledFacet("cancelled"),
+    ReviewCountFacet("reviews"),
+    ReviewerFacet("reviewer"),
+]
+
+
+class FacetedSearch:
+    """
+    The ``FACETS`` selected in a query string, applied to a queryset of
+    submissions.
+
+    ``choices()`` counts the submissions for every value of every facet
+    with a single query: a UNION ALL of one grouped aggregation per facet,
+    each narrowed by the values selected for the other facets, so picking
+    a kind still shows how many submissions the other kinds have.
+    """
+
+    def __init__(self, queryset, params, facets=None):
+        self.queryset = queryset
+        self.facets = FACETS if facets is None else facets
+        self.selected = {
+            facet.name: facet.clean([value for value in params.getlist(facet.name) if value])
+            for facet in self.facets
+        }
+
+    def apply(self, queryset, exclude=None):
+        for facet in self.facets:
+            if facet is not exclude and self.selected[facet.name]:
+                queryset = facet.filter(queryset, self.selected[facet.name])
+        return queryset
+
+    def filter(self):
+        return self.apply(self.queryset)
+
+    def querystring(self):
+        return urlencode([
+            (name, value) for name, values in self.selected.items() for value in values
+        ])
+
+    def choices(self):
+        """
+        Return a ``(facet, choices)`` pair per facet, each choice a dict
+        with its ``value``, ``label``, ``count`` and whether it is
+        ``selected``.
+        """
+        parts = [
+            facet.counts(facet.prepare(self.apply(self.queryset.order_by(), exclude=facet)))
+            for facet in self.facets
+        ]
+        groups = {facet.name: [] for facet in self.facets}
+        for row in parts[0].union(*parts[1:], all=True):
+            groups[row["facet"]].append((row["value"], row["label"], row["count"]))
+
+        result = []
+        for facet in self.facets:
+            selected = self.selected[facet.name]
+            result.append((facet, [
+                {"value": value, "label": label, "count": count, "selected": value in selected}
+                for value, label, count in facet.choices(groups[facet.name])
+            ]))
+        return result
@@ -1,77 +1,339 @@
+import functools
+import hashlib
+import uuid
+from collections import defaultdict
+
 from django.contrib.auth import get_user_model
 from django.contrib.auth.models import Permission
 from django.contrib.sites.models import Site
-from django.core.mail import EmailMultiAlternatives
-from django.db import models
-from django.db.models import Q
-from django.template.loader import render_to_string
+from django.core.cache import caches
+from django.core.mail import EmailMultiAlternatives, get_connection
+from django.db import connections, transaction
+from django.db.models import Count, Q, QuerySet
+from django.template import TemplateDoesNotExist
+from django.template.loader import get_template
 from django.utils.html import strip_tags
 
+from .assignment import AssignmentState, BalancedAssignmentStrategy
+
 
 class DefaultHookSet:
 
     def __init__(self):
         from .conf import settings  # if put globally there is a race condition
         self.settings = settings
+        self._email_templates = {}
+
+    def permissions_cache(self):
+        return caches[self.settings.PINAX_SUBMISSIONS_PERMISSIONS_CACHE]
+
+    def permissions_version(self):
+        """
+        A token that changes whenever permissions or group memberships do,
+        used as part of the key of everything cached from them.
+        """
+        cache = self.permissions_cache()
+        version = cache.get("pinax-submissions:permissions-version")
+        if version is None:
+            cache.add("pinax-submissions:permissions-version", uuid.uuid4().hex, None)
+            version = cache.get("pinax-submissions:permissions-version")
+        return version
+
+    def invalidate_permissions(self):
+        self.permissions_cache().set("pinax-submissions:permissions-version", uuid.uuid4().hex, None)
+
+    def fragment_cache(self):
+        return caches[self.settings.PINAX_SUBMISSIONS_FRAGMENT_CACHE]
+
+    def submission_versions(self, pks):
+        """
+        Map each of ``pks`` to a token that changes whenever the submission
+        or anything shown with it does, used to key its cached fragments.
+        """
+        cache = self.fragment_cache()
+        keys = {f"pinax-submissions:submission-version:{pk}": pk for pk in pks}
+        versions = cache.get_many(list(keys))
+        missing = [key for key in keys if key not in versions]
+        if missing:
+            # add() so a concurrent bump isn't overwritten
+            for key in missing:
+                cache.add(key, uuid.uuid4().hex, None)
+            versions.update(cache.get_many(missing))
+        return {keys[key]: version for key, version in versions.items()}
+
+    def bump_submission_versions(self, pks):
+        """
+        Change the tokens of ``pks`` once the current transaction commits,
+        so no one can cache what they read before the change under the new
+        token.
+        """
+        versions = {
+            f"pinax-submissions:submission-version:{pk}": uuid.uuid4().hex
+            for pk in pks
+        }
+        transaction.on_commit(lambda: self.fragment_cache().set_many(versions, None))
 
     def reviewers(self):
-        perm = Permission.objects.get(
-            content_type__app_label="submissions",
-            codename="add_review")
-        return get_user_model().objects.filter(
-            Q(groups__permissions=perm) | Q(user_permissions=perm)
-        ).distinct()
+        """
+        The users with the ``add_review`` permission, directly or through a
+        group. Their pks are cached until permissions or group memberships
+        change, so this is a plain ``pk__in`` lookup.
+        """
+        cache = self.permissions_cache()
+        key = f"pinax-submissions:reviewers:{self.permissions_version()}"
+        pks = cache.get(key)
+        if pks is None:
+            perm = Permission.objects.get(
+                content_type__app_label="submissions",
+                codename="add_review")
+            pks = list(get_user_model().objects.filter(
+                Q(groups__permissions=perm) | Q(user_permissions=perm)
+            ).values_list("pk", flat=True).distinct())
+            cache.set(key, pks, self.settings.PINAX_SUBMISSIONS_PERMISSIONS_CACHE_TIMEOUT)
+        return get_user_model().objects.filter(pk__in=pks)
+
+    def user_permissions(self, user):
+        """
+        ``user.get_all_permissions()``, cached across requests until
+        permissions or group memberships change.
+        """
+        if not user.is_active:
+            return set()
+        cache = self.permissions_cache()
+        key = f"pinax-submissions:permissions:{self.permissions_version()}:{user.pk}"
+        perms = cache.get(key)
+        if perms is None:
+            perms = user.get_all_permissions()
+            cache.set(key, perms, self.settings.PINAX_SUBMISSIONS_PERMISSIONS_CACHE_TIMEOUT)
+        return perms
+
+    def reviewer_pools(self):
+        """
+        Map each ``SubmissionKind`` pk to the pks of the reviewers who may be
+        assigned to it: the members of a ``reviewers-<kind slug>`` group, or
+        of the ``reviewers`` group for kinds without one.
+        """
+        from .models import SubmissionKind
+
+        members = defaultdict(list)
+        memberships = get_user_model().groups.through.objects.filter(
+            Q(group__name="reviewers") | Q(group__name__startswith="reviewers-")
+        ).values_list("group__name", "user_id")
+        for group_name, user_id in memberships:
+            members[group_name].append(user_id)
+        return {
+            kind_id: members.get(f"reviewers-{slug}") or members["reviewers"]
+            for kind_id, slug in SubmissionKind.objects.values_list("pk", "slug")
+        }
+
+    def reviewer_pool(self, kind):
+        """
+        The pks of the reviewers in ``kind``'s pool, as a subquery; see
+        ``reviewer_pools``.
+        """
+        memberships = get_user_model().groups.through.objects
+        members = memberships.filter(group__name=f"reviewers-{kind.slug}")
+        if not members.exists():
+            members = memberships.filter(group__name="reviewers")
+        return members.values("user_id")
+
+    def reviewer_weight(self, kind_id, user_id):
+        """
+        How well suited a reviewer is to a kind of submission; reviewers
+        with twice the weight get twice as many assignments, and a weight
+        of zero keeps them out of that kind's pool.
+        """
+        return 1
+
+    def assignment_conflicts(self, submission):
+        """
+        Return the pks of users who must not review ``submission``.
+        """
+        return {submission.submitter_id}
+
+    def assignment_strategy(self, cls):
+        return BalancedAssignmentStrategy(
+            num_reviewers=cls.NUM_REVIEWERS,
+            weight=self.reviewer_weight,
+            conflicts=self.assignment_conflicts,
+        )
 
     def create_assignments(self, cls, submission, origin):
-        reviewers = get_user_model().objects.exclude(
-            pk__in=[
-                assignment.user_id
-                for assignment in cls.objects.filter(
-                    submission=submission
-                )
-            ]
-        ).filter(
-            groups__name="reviewers",
-        ).filter(
-            Q(reviewassignment__opted_out=False) | Q(reviewassignment=None)
-        ).annotate(
-            num_assignments=models.Count("reviewassignment")
-        ).order_by(
-            "num_assignments", "?",
+        self.create_bulk_assignments(cls, [submission], origin)
+
+    def create_bulk_assignments(self, cls, submissions, origin, commit=True):
+        """
+        Assign reviewers to many submissions at once.
+
+        The reviewer pools, the load of the reviewers in the pools of the
+        submissions' kinds and the submissions' existing assignments and
+        opt-outs are loaded up front, the ``assignment_strategy`` picks the
+        reviewers in memory and the new assignments are written with a
+        single ``bulk_create``.
+        """
+        from .models import ReviewerStats
+
+        if isinstance(submissions, QuerySet):
+            scope = submissions.order_by().values("pk")
+            submissions = list(submissions)
+        else:
+            submissions = list(submissions)
+            scope = [submission.pk for submission in submissions]
+        pools = self.reviewer_pools()
+        reviewers = set().union(*(pools.get(submission.kind_id, []) for submission in submissions))
+        state = AssignmentState.from_loads(
+            cls.objects.filter(user__in=reviewers, opted_out=False).values_list(
+                "user_id", "submission__kind_id"
+            ).annotate(count=Count("pk")).order_by().iterator(),
+            cls.objects.filter(submission__in=scope).values_list(
+                "submission_id", "user_id", "opted_out"
+            ).iterator(),
         )
-        num_assigned_reviewers = cls.objects.filter(
-            submission=submission,
-            opted_out=False
-        ).count()
-        for reviewer in reviewers[:max(0, cls.NUM_REVIEWERS - num_assigned_reviewers)]:
-            cls._default_manager.create(
+        pairs = self.assignment_strategy(cls).assign(
+            submissions,
+            pools,
+            state,
+        )
+        assignments = [
+            cls(submission=submission, user_id=user_id, origin=origin)
+            for submission, user_id in pairs
+        ]
+        if commit:
+            with transaction.atomic():
+                cls._default_manager.bulk_create(assignments)
+                # the pool members without stats get them, so ``reassign`` can pick them
+                pool = set().union(*pools.values())
+                missing = pool - set(ReviewerStats.objects.filter(user__in=pool).values_list("user_id", flat=True))
+                ReviewerStats.objects.refresh({assignment.user_id for assignment in assignments} | missing)
+            self.bump_submission_versions({assignment.submission_id for assignment in assignments})
+        return assignments
+
+    def reassign(self, cls, assignment):
+        """
+        Opt out of ``assignment`` and assign a replacement reviewer.
+
+        Rather than re-running the assignment strategy, the replacement is
+        the least loaded reviewer in the pool according to ``ReviewerStats``,
+        read off its index and locked with ``select_for_update`` so that
+        concurrent opt-outs don't all land on the same reviewer. Falls back
+        to ``create_assignments`` if no reviewer has stats yet.
+        """
+        from .models import ReviewerStats
+
+        with transaction.atomic():
+            if not cls.objects.filter(pk=assignment.pk, opted_out=False).update(opted_out=True):
+                return None
+            ReviewerStats.objects.assignment_opted_out(assignment)
+            assignment.opted_out = True
+            self.bump_submission_versions([assignment.submission_id])
+
+            submission = assignment.submission
+            if cls.objects.filter(submission=submission, opted_out=False).count() >= cls.NUM_REVIEWERS:
+                return None
+            skip_locked = connections[ReviewerStats.objects.db].features.has_select_for_update_skip_locked
+            candidates = ReviewerStats.objects.filter(
+                user__in=self.reviewer_pool(submission.kind)
+            ).exclude(
+                user__in=self.assignment_conflicts(submission)
+            ).exclude(
+                user__in=cls.objects.filter(submission=submission).values("user_id")
+            ).order_by("assignment_count", "user_id").select_for_update(skip_locked=skip_locked)
+
+            stats = candidates.first()
+            while stats is not None and self.reviewer_weight(submission.kind_id, stats.user_id) <= 0:
+                candidates = candidates.exclude(user=stats.user_id)
+                stats = candidates.first()
+            if stats is None:
+                assignments = self.create_bulk_assignments(cls, [submission], cls.AUTO_ASSIGNED_LATER)
+                return assignments[0] if assignments else None
+
+            # saving the assignment counts it in the replacement's stats
+            return cls.objects.create(
                 submission=submission,
-                user=reviewer,
-                origin=origin,
+                user_id=stats.user_id,
+                origin=cls.AUTO_ASSIGNED_LATER
             )
 
+    def renderer_name(self, renderer):
+        """
+        A name for ``renderer`` that is the same in every process, or
+        ``None`` if it has none (like a callable object).
+        """
+        args = ""
+        if isinstance(renderer, functools.partial):
+            args = repr((renderer.args, sorted(renderer.keywords.items())))
+            renderer = renderer.func
+        name = getattr(renderer, "__qualname__", None)
+        # a repr with a memory address differs between processes
+        if name is None or " at 0x" in args:
+            return None
+        return f"{getattr(renderer, '__module__', '')}.{name}{args}"
+
     def parse_content(self, content):
-        return self.settings.PINAX_SUBMISSIONS_MARKUP_RENDERER(content)
+        """
+        Render ``content`` with the configured markup renderer, memoized in
+        the ``PINAX_SUBMISSIONS_MARKUP_CACHE`` cache by a hash of the
+        renderer and the source text. Renderers without a stable
+        ``renderer_name`` aren't memoized.
+        """
+        renderer = self.settings.PINAX_SUBMISSIONS_MARKUP_RENDERER
+        name = self.renderer_name(renderer)
+        if name is None:
+            return renderer(content)
+        digest = hashlib.sha256()
+        digest.update(name.encode())
+        digest.update(b"\0")
+        digest.update(content.encode())
+        key = f"pinax-submissions:markup:{digest.hexdigest()}"
 
-    def send_email(self, to, kind, **kwargs):
-        current_site = Site.objects.get_current()
+        cache = caches[self.settings.PINAX_SUBMISSIONS_MARKUP_CACHE]
+        html = cache.get(key)
+        if html is None:
+            html = renderer(content)
+            cache.set(key, html, self.settings.PINAX_SUBMISSIONS_MARKUP_CACHE_TIMEOUT)
+        return html
+
+    def get_email_templates(self, kind):
+        """
+        Return the compiled subject, HTML and (optional) plaintext templates
+        for ``kind``, loading them only once per process.
+        """
+        try:
+            return self._email_templates[kind]
+        except KeyError:
+            pass
+        try:
+            plaintext = get_template("pinax/submissions/emails/%s/message.txt" % kind)
+        except TemplateDoesNotExist:
+            plaintext = None
+        templates = (
+            get_template("pinax/submissions/emails/%s/subject.txt" % kind),
+            get_template("pinax/submissions/emails/%s/message.html" % kind),
+            plaintext,
+        )
+        if not self.settings.DEBUG:
+            self._email_templates[kind] = templates
+        return templates
+
+    def build_email(self, to, kind, context, current_site=None):
+        if current_site is None:
+            current_site = Site.objects.get_current()
+        subject_template, html_template, plaintext_template = self.get_email_templates(kind)
         ctx = {
             "current_site": current_site,
             "STATIC_URL": self.settings.STATIC_URL,
         }
-        ctx.update(kwargs.get("context", {}))
+        ctx.update(context)
         subject = "[{}] {}".format(
             current_site.name,
-            render_to_string(
-                "pinax/submissions/emails/%s/subject.txt" % kind,
-                ctx).strip()
+            subject_template.render(ctx).strip()
         )
 
-        message_html = render_to_string(
-            "pinax/submissions/emails/%s/message.html" % kind,
-            ctx
-        )
-        message_plaintext = strip_tags(message_html)
+        message_html = html_template.render(ctx)
+        if plaintext_template is not None:
+            message_plaintext = plaintext_template.render(ctx)
+        else:
+            message_plaintext = strip_tags(message_html)
 
         from_email = self.settings.DEFAULT_FROM_EMAIL
 
@@ -82,7 +344,34 @@ class DefaultHookSet:
             to
         )
         email.attach_alternative(message_html, "text/html")
-        email.send()
+        return email
+
+    def send_email(self, to, kind, **kwargs):
+        self.send_emails([(to, kwargs.get("context", {}))], kind)
+
+    def send_emails(self, recipients, kind):
+        """
+        Send one email of ``kind`` for each ``(to, context)`` pair in
+        ``recipients``.
+
+        With ``PINAX_SUBMISSIONS_EMAIL_QUEUE`` enabled the emails are stored
+        with a single INSERT and delivered by the ``send_queued_email``
+        command, otherwise they are sent right away over one connection.
+        """
+        from .models import QueuedEmail
+
+        recipients = list(recipients)
+        if not recipients:
+            return
+        current_site = Site.objects.get_current()
+        emails = [
+            self.build_email(to, kind, context, current_site=current_site)
+            for to, context in recipients
+        ]
+        if self.settings.PINAX_SUBMISSIONS_EMAIL_QUEUE:
+            QueuedEmail.objects.enqueue(emails)
+        else:
+            get_connection().send_messages(emails)
 
     def get_submission_add_success_url(self, submission):
         return "/"
@@ -0,0 +1,46 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from ...conf import settings
+from ...documents import stream_archive
+from ...models import SupportingDocument
+
+
+class Command(BaseCommand):
+
+    help = "Write a ZIP archive of the supporting documents of a set of submissions."
+
+    def add_arguments(self, parser):
+        parser.add_argument("output", help="Path of the ZIP file to write.")
+        parser.add_argument(
+            "--reviewer",
+            help="Only include the submissions assigned to the user with this username.",
+        )
+        parser.add_argument(
+            "--status",
+            help="Only include submissions with this result status, e.g. accepted.",
+        )
+        parser.add_argument(
+            "--max-file-size",
+            type=int,
+            dest="max_file_size",
+            default=settings.PINAX_SUBMISSIONS_DOCUMENT_ARCHIVE_MAX_FILE_SIZE,
+            help="Leave out files larger than this many bytes.",
+        )
+
+    def handle(self, *args, **options):
+        reviewer = None
+        if options["reviewer"]:
+            User = get_user_model()
+            try:
+                reviewer = User.objects.get(**{User.USERNAME_FIELD: options["reviewer"]})
+            except User.DoesNotExist:
+                raise CommandError(f"No user named {options['reviewer']}")
+
+        documents = SupportingDocument.objects.for_archive(reviewer=reviewer, status=options["status"])
+        size = 0
+        with open(options["output"], "wb") as fp:
+            for chunk in stream_archive(documents.iterator(), max_file_size=options["max_file_size"]):
+                fp.write(chunk)
+                size += len(chunk)
+        self.stdout.write(f"Wrote {size} bytes to {options['output']}")
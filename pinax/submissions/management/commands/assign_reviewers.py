@@ -1,11 +1,50 @@
+import time
+
 from django.core.management.base import BaseCommand
+from django.db import connection
 
-from ..models import ReviewAssignment, SubmissionBase
+from ...models import ReviewAssignment, SubmissionBase
 
 
 class Command(BaseCommand):
 
+    help = "Assign reviewers to all non-cancelled submissions in one batch."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            dest="dry_run",
+            help="Compute the assignments without saving them.",
+        )
+
     def handle(self, *args, **options):
-        for submission in SubmissionBase.objects.filter(cancelled=False):
-            print(f"Creating assignments for {submission}")
-            ReviewAssignment.create_assignments(submission)
+        queries = []
+
+        def count_queries(execute, sql, params, many, context):
+            queries.append(sql)
+            return execute(sql, params, many, context)
+
+        start = time.monotonic()
+        with connection.execute_wrapper(count_queries):
+            submissions = SubmissionBase.objects.filter(
+                cancelled=False
+            ).order_by("submitted", "pk")
+            assignments = ReviewAssignment.create_bulk_assignments(
+                submissions,
+                commit=not options["dry_run"],
+            )
+        elapsed = time.monotonic() - start
+
+        if options["verbosity"] > 1:
+            for assignment in assignments:
+                self.stdout.write(
+                    f"Assigning user {assignment.user_id} to {assignment.submission}"
+                )
+
+        verb = "Would create" if options["dry_run"] else "Created"
+        submission_count = len({assignment.submission_id for assignment in assignments})
+        self.stdout.write(
+            f"{verb} {len(assignments)} assignments for {submission_count} submissions "
+            f"in {elapsed:.2f}s ({len(queries)} queries)"
+        )
@@ -0,0 +1,38 @@
+from django.core.management.base import BaseCommand
+
+from ...conf import settings
+from ...export import FORMATS, export_rows
+
+
+class Command(BaseCommand):
+
+    help = "Export submissions with their status and reviews as CSV or newline-delimited JSON."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--format",
+            choices=sorted(FORMATS),
+            default="csv",
+            help="Output format.",
+        )
+        parser.add_argument(
+            "--output",
+            help="File to write to, defaults to stdout.",
+        )
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            dest="chunk_size",
+            default=settings.PINAX_SUBMISSIONS_EXPORT_CHUNK_SIZE,
+            help="Number of submissions to load at a time.",
+        )
+
+    def handle(self, *args, **options):
+        _, writer = FORMATS[options["format"]]
+        lines = writer(export_rows(chunk_size=options["chunk_size"]))
+        if options["output"]:
+            with open(options["output"], "w", newline="") as fp:
+                fp.writelines(lines)
+        else:
+            for line in lines:
+                self.stdout.write(line, ending="")
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from ...models import ReviewerStats
+
+
+class Command(BaseCommand):
+
+    help = "Rebuild every reviewer's stats from their assignments and reviews."
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            count = ReviewerStats.objects.refresh()
+        self.stdout.write(f"Rebuilt stats for {count} reviewers")
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from ...search import rebuild_index
+
+
+class Command(BaseCommand):
+
+    help = "Rebuild the search index of every submission, with its reviews and messages."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=500)
+
+    def handle(self, *args, **options):
+        count = rebuild_index(batch_size=options["batch_size"])
+        self.stdout.write(f"Indexed {count} submissions")
@@ -0,0 +1,49 @@
+from django.core.management.base import BaseCommand
+
+from ...hooks import hookset
+from ...models import Comment, Review, SubmissionMessage
+
+MARKUP_FIELDS = [
+    (Review, "comment", "comment_html"),
+    (SubmissionMessage, "message", "message_html"),
+    (Comment, "text", "text_html"),
+]
+
+
+class Command(BaseCommand):
+
+    help = "Re-render the stored HTML of reviews, messages and comments."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=500,
+            dest="batch_size",
+            help="Number of rows to read and update at a time.",
+        )
+
+    def update(self, model, batch, target):
+        model._default_manager.bulk_update(batch, [target])
+        # bulk_update doesn't send post_save, so cached fragments need a bump
+        hookset.bump_submission_versions({obj.submission_id for obj in batch})
+
+    def handle(self, *args, **options):
+        batch_size = options["batch_size"]
+        for model, source, target in MARKUP_FIELDS:
+            updated = 0
+            batch = []
+            queryset = model._default_manager.only("pk", "submission_id", source, target).order_by()
+            for obj in queryset.iterator(chunk_size=batch_size):
+                html = hookset.parse_content(getattr(obj, source))
+                if html != getattr(obj, target):
+                    setattr(obj, target, html)
+                    batch.append(obj)
+                if len(batch) >= batch_size:
+                    self.update(model, batch, target)
+                    updated += len(batch)
+                    batch = []
+            if batch:
+                self.update(model, batch, target)
+                updated += len(batch)
+            self.stdout.write(f"Re-rendered {updated} {model._meta.verbose_name_plural}")
@@ -0,0 +1,42 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from ...models import QueuedEmail
+
+
+class Command(BaseCommand):
+
+    help = "Send the emails queued by the submissions app."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            dest="batch_size",
+            help="Number of emails to send per connection.",
+        )
+        parser.add_argument(
+            "--loop",
+            action="store_true",
+            help="Keep polling for new emails instead of exiting once the queue is empty.",
+        )
+        parser.add_argument(
+            "--sleep",
+            type=float,
+            default=10,
+            help="Seconds to wait between polls when looping.",
+        )
+
+    def handle(self, *args, **options):
+        total_sent = total_failed = 0
+        while True:
+            sent, failed = QueuedEmail.objects.send_queued(batch_size=options["batch_size"])
+            total_sent += sent
+            total_failed += failed
+            if sent or failed:
+                continue
+            if not options["loop"]:
+                break
+            time.sleep(options["sleep"])
+        self.stdout.write(f"Sent {total_sent} emails, {total_failed} failed")
@@ -0,0 +1,21 @@
+from django.db import migrations
+
+
+def create_missing_results(apps, schema_editor):
+    SubmissionBase = apps.get_model("submissions", "SubmissionBase")
+    SubmissionResult = apps.get_model("submissions", "SubmissionResult")
+    missing = SubmissionBase.objects.filter(result__isnull=True).values_list("pk", flat=True)
+    SubmissionResult.objects.bulk_create([
+        SubmissionResult(submission_id=pk) for pk in missing.iterator()
+    ], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("submissions", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.RunPython(create_missing_results, migrations.RunPython.noop),
+    ]
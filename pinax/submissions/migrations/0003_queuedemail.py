@@ -0,0 +1,39 @@
+# Generated by Django 3.0.14 on 2026-10-18 07:23
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('submissions', '0002_create_missing_results'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='QueuedEmail',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('from_email', models.CharField(max_length=254, verbose_name='From')),
+                ('to', models.TextField(verbose_name='To')),
+                ('subject', models.CharField(max_length=255, verbose_name='Subject')),
+                ('body', models.TextField(verbose_name='Body')),
+                ('html_body', models.TextField(blank=True, verbose_name='HTML body')),
+                ('status', models.CharField(choices=[('queued', 'queued'), ('sent', 'sent'), ('failed', 'failed')], default='queued', max_length=20, verbose_name='Status')),
+                ('attempts', models.PositiveIntegerField(default=0, verbose_name='Attempts')),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Created at')),
+                ('next_attempt_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Next attempt at')),
+                ('sent_at', models.DateTimeField(blank=True, null=True, verbose_name='Sent at')),
+                ('last_error', models.TextField(blank=True, verbose_name='Last error')),
+            ],
+            options={
+                'verbose_name': 'queued email',
+                'verbose_name_plural': 'queued emails',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='queuedemail',
+            index=models.Index(fields=['status', 'next_attempt_at'], name='submissions_status_4cf3e6_idx'),
+        ),
+    ]
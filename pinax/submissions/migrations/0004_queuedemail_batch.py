@@ -0,0 +1,18 @@
+# Generated by Django 3.0.14 on 2026-10-18 07:24
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('submissions', '0003_queuedemail'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='queuedemail',
+            name='batch',
+            field=models.CharField(blank=True, db_index=True, max_length=36, verbose_name='Batch'),
+        ),
+    ]
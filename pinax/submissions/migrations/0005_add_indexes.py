@@ -0,0 +1,33 @@
+# Generated by Django 3.0.14 on 2026-10-18 07:25
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('submissions', '0004_queuedemail_batch'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='review',
+            index=models.Index(fields=['user', 'submission'], name='submissions_user_id_25d186_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='reviewassignment',
+            index=models.Index(fields=['user', 'opted_out'], name='submissions_user_id_a537a8_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='submissionbase',
+            index=models.Index(fields=['cancelled', 'submitted'], name='submissions_cancell_e0b4e9_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='submissionbase',
+            index=models.Index(fields=['submitted', 'id'], name='submissions_submitt_658ce9_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='submissionresult',
+            index=models.Index(fields=['status', 'submission'], name='submissions_status_7c4e78_idx'),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 3.0.14 on 2026-10-18 07:25
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('submissions', '0005_add_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SubmissionResultLog',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('old_status', models.CharField(max_length=20, verbose_name='Old status')),
+                ('new_status', models.CharField(max_length=20, verbose_name='New status')),
+                ('timestamp', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Timestamp')),
+                ('submission', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='result_log', to='submissions.SubmissionBase', verbose_name='Submission')),
+                ('user', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to=settings.AUTH_USER_MODEL, verbose_name='User')),
+            ],
+            options={
+                'verbose_name': 'submission result log entry',
+                'verbose_name_plural': 'submission result log',
+                'ordering': ['timestamp'],
+            },
+        ),
+    ]
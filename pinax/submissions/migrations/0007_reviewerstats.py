@@ -0,0 +1,32 @@
+# Generated by Django 3.0.14 on 2026-10-18 07:31
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('submissions', '0006_submissionresultlog'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReviewerStats',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('assignment_count', models.PositiveIntegerField(default=0, verbose_name='Assignment count')),
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='reviewer_stats', to=settings.AUTH_USER_MODEL, verbose_name='User')),
+            ],
+            options={
+                'verbose_name': 'reviewer stats',
+                'verbose_name_plural': 'reviewer stats',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='reviewerstats',
+            index=models.Index(fields=['assignment_count', 'user'], name='submissions_assignm_fb8776_idx'),
+        ),
+    ]
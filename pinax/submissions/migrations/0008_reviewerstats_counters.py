@@ -0,0 +1,33 @@
+# Generated by Django 3.0.14 on 2026-10-18 07:34
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('submissions', '0007_reviewerstats'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='reviewerstats',
+            name='average_turnaround',
+            field=models.DurationField(blank=True, null=True, verbose_name='Average turnaround'),
+        ),
+        migrations.AddField(
+            model_name='reviewerstats',
+            name='opt_out_count',
+            field=models.PositiveIntegerField(default=0, verbose_name='Opt-out count'),
+        ),
+        migrations.AddField(
+            model_name='reviewerstats',
+            name='outstanding_count',
+            field=models.PositiveIntegerField(default=0, verbose_name='Outstanding count'),
+        ),
+        migrations.AddField(
+            model_name='reviewerstats',
+            name='review_count',
+            field=models.PositiveIntegerField(default=0, verbose_name='Review count'),
+        ),
+    ]
@@ -0,0 +1,76 @@
+# Generated by Django 3.0.14 on 2026-10-18 07:44
+
+from django.db import migrations, models
+import django.db.models.deletion
+from django.db.utils import OperationalError
+
+SQLITE_INDEX = [
+    "CREATE VIRTUAL TABLE submissions_searchdocument_fts USING fts5("
+    "text, content='submissions_searchdocument', content_rowid='submission_id')",
+    "CREATE TRIGGER submissions_searchdocument_ai AFTER INSERT ON submissions_searchdocument BEGIN "
+    "INSERT INTO submissions_searchdocument_fts(rowid, text) VALUES (new.submission_id, new.text); END",
+    "CREATE TRIGGER submissions_searchdocument_ad AFTER DELETE ON submissions_searchdocument BEGIN "
+    "INSERT INTO submissions_searchdocument_fts(submissions_searchdocument_fts, rowid, text) "
+    "VALUES ('delete', old.submission_id, old.text); END",
+    "CREATE TRIGGER submissions_searchdocument_au AFTER UPDATE ON submissions_searchdocument BEGIN "
+    "INSERT INTO submissions_searchdocument_fts(submissions_searchdocument_fts, rowid, text) "
+    "VALUES ('delete', old.submission_id, old.text); "
+    "INSERT INTO submissions_searchdocument_fts(rowid, text) VALUES (new.submission_id, new.text); END",
+]
+
+SQLITE_DROP = [
+    "DROP TRIGGER IF EXISTS submissions_searchdocument_ai",
+    "DROP TRIGGER IF EXISTS submissions_searchdocument_ad",
+    "DROP TRIGGER IF EXISTS submissions_searchdocument_au",
+    "DROP TABLE IF EXISTS submissions_searchdocument_fts",
+]
+
+POSTGRESQL_INDEX = [
+    "ALTER TABLE submissions_searchdocument ADD COLUMN search_vector tsvector "
+    "GENERATED ALWAYS AS (to_tsvector('english', text)) STORED",
+    "CREATE INDEX submissions_searchdocument_vector ON submissions_searchdocument USING GIN (search_vector)",
+]
+
+
+def create_search_index(apps, schema_editor):
+    # other databases are searched with the pure-Python index
+    vendor = schema_editor.connection.vendor
+    if vendor == "sqlite":
+        try:
+            for sql in SQLITE_INDEX:
+                schema_editor.execute(sql)
+        except OperationalError:
+            # SQLite built without FTS5
+            for sql in SQLITE_DROP:
+                schema_editor.execute(sql)
+    elif vendor == "postgresql" and schema_editor.connection.pg_version >= 120000:
+        for sql in POSTGRESQL_INDEX:
+            schema_editor.execute(sql)
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor == "sqlite":
+        for sql in SQLITE_DROP:
+            schema_editor.execute(sql)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('submissions', '0008_reviewerstats_counters'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SearchDocument',
+            fields=[
+                ('submission', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='search_document', serialize=False, to='submissions.SubmissionBase', verbose_name='Submission')),
+                ('text', models.TextField(blank=True, verbose_name='Text')),
+            ],
+            options={
+                'verbose_name': 'search document',
+                'verbose_name_plural': 'search documents',
+            },
+        ),
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,68 @@
+# Generated by Django 3.0.14 on 2026-10-18 08:07
+
+import datetime
+from collections import Counter, defaultdict
+
+from django.db import migrations, models
+
+
+def rebuild_reviewer_stats(apps, schema_editor):
+    """
+    Compute the stats of every reviewer, which earlier versions only did
+    as their assignments and reviews changed.
+    """
+    Review = apps.get_model("submissions", "Review")
+    ReviewAssignment = apps.get_model("submissions", "ReviewAssignment")
+    ReviewerStats = apps.get_model("submissions", "ReviewerStats")
+
+    assigned_at = {}
+    counts = defaultdict(Counter)
+    turnaround = defaultdict(datetime.timedelta)
+    rows = ReviewAssignment.objects.order_by("assigned_at").values_list("user_id", "submission_id", "opted_out", "assigned_at")
+    for user_id, submission_id, opted_out, assigned in rows.iterator():
+        assigned_at.setdefault((user_id, submission_id), assigned)
+        counts[user_id]["opt_out_count" if opted_out else "assignment_count"] += 1
+    reviewed = set()
+    for user_id, submission_id, submitted_at in Review.objects.values_list("user_id", "submission_id", "submitted_at").iterator():
+        counts[user_id]["review_count"] += 1
+        assigned = assigned_at.get((user_id, submission_id))
+        if assigned is not None and submitted_at >= assigned:
+            turnaround[user_id] += submitted_at - assigned
+            counts[user_id]["turnaround_count"] += 1
+        reviewed.add((user_id, submission_id))
+    active = ReviewAssignment.objects.filter(opted_out=False).values_list("user_id", "submission_id")
+    for user_id, submission_id in active.iterator():
+        if (user_id, submission_id) not in reviewed:
+            counts[user_id]["outstanding_count"] += 1
+
+    ReviewerStats.objects.all().delete()
+    ReviewerStats.objects.bulk_create([
+        ReviewerStats(
+            user_id=user_id,
+            total_turnaround=turnaround[user_id],
+            average_turnaround=turnaround[user_id] / user_counts["turnaround_count"] if user_counts["turnaround_count"] else None,
+            **user_counts
+        )
+        for user_id, user_counts in counts.items()
+    ], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('submissions', '0009_searchdocument'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='reviewerstats',
+            name='total_turnaround',
+            field=models.DurationField(default=datetime.timedelta(0), verbose_name='Total turnaround'),
+        ),
+        migrations.AddField(
+            model_name='reviewerstats',
+            name='turnaround_count',
+            field=models.PositiveIntegerField(default=0, verbose_name='Turnaround count'),
+        ),
+        migrations.RunPython(rebuild_reviewer_stats, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,48 @@
+from django.db import migrations, models
+
+
+def backfill_search_documents(apps, schema_editor):
+    """
+    Index the submissions created before the search index existed, like
+    ``SearchDocumentManager.update_for`` does.
+    """
+    SubmissionBase = apps.get_model("submissions", "SubmissionBase")
+    SearchDocument = apps.get_model("submissions", "SearchDocument")
+    Review = apps.get_model("submissions", "Review")
+    SubmissionMessage = apps.get_model("submissions", "SubmissionMessage")
+
+    unindexed = SubmissionBase.objects.filter(search_document__isnull=True).values_list("pk", flat=True)
+    # each submission's fields come from its most derived subclass
+    parts = {pk: (0, []) for pk in unindexed.iterator()}
+    for model in apps.get_models():
+        if model is SubmissionBase or not issubclass(model, SubmissionBase) or model._meta.proxy:
+            continue
+        depth = len(model._meta.get_parent_list())
+        fields = [
+            field.attname for field in model._meta.concrete_fields
+            if field.model is not SubmissionBase and isinstance(field, (models.CharField, models.TextField))
+        ]
+        for pk, *values in model.objects.values_list("pk", *fields).iterator():
+            if pk in parts and depth > parts[pk][0]:
+                parts[pk] = (depth, list(values))
+    parts = {pk: values for pk, (depth, values) in parts.items()}
+    for model, field in [(Review, "comment"), (SubmissionMessage, "message")]:
+        for submission_id, text in model.objects.values_list("submission_id", field).order_by("pk").iterator():
+            if submission_id in parts:
+                parts[submission_id].append(text)
+
+    SearchDocument.objects.bulk_create([
+        SearchDocument(submission_id=pk, text="\n".join(text for text in values if text))
+        for pk, values in parts.items()
+    ], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("submissions", "0010_reviewerstats_turnaround"),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_search_documents, migrations.RunPython.noop),
+    ]
@@ -1,14 +1,38 @@
+import itertools
 import os
 import uuid
+from collections import Counter, defaultdict
+from datetime import timedelta
 
 from django.conf import settings
 from django.core.exceptions import ObjectDoesNotExist
-from django.db import models
+from django.core.mail import (
+    EmailMessage,
+    EmailMultiAlternatives,
+    get_connection,
+)
+from django.db import connections, models, transaction
+from django.db.models import (
+    Count,
+    Exists,
+    F,
+    Min,
+    OuterRef,
+    Q,
+    Subquery,
+    Value,
+)
+from django.db.models.functions import Coalesce
+from django.template import Context, Template
 from django.urls import reverse
 from django.utils import timezone
 from django.utils.translation import ugettext_lazy as _
 
-from model_utils.managers import InheritanceManager
+from model_utils.managers import (
+    InheritanceIterable,
+    InheritanceManager,
+    InheritanceQuerySet,
+)
 
 from .hooks import hookset
 
@@ -30,6 +54,150 @@ class SubmissionKind(models.Model):
         return self.name
 
 
+RESULT_STATUSES = {
+    "accept": "accepted",
+    "reject": "rejected",
+    "undecide": "undecided",
+    "standby": "standby",
+}
+
+
+class SubqueryCount(Subquery):
+    """
+    Counts the rows of a correlated subquery, without the GROUP BY a
+    ``Count`` annotation would need on the outer query.
+    """
+    template = "(SELECT COUNT(*) FROM (%(subquery)s) _count)"
+    output_field = models.IntegerField()
+
+
+class SubmissionIterable(InheritanceIterable):
+    """
+    Carries relations loaded with ``select_related`` on the base model over
+    to the concrete subclass instances produced by ``select_subclasses``,
+    so that e.g. ``submission.result`` doesn't query again for every row.
+    """
+
+    def __iter__(self):
+        base_model = self.queryset.model
+        for obj in super().__iter__():
+            parent = obj
+            while parent is not None and type(parent) is not base_model:
+                link = parent._meta.get_ancestor_link(base_model)
+                parent = link.get_cached_value(parent, None) if link else None
+            if parent is not None and parent is not obj:
+                for name, value in parent._state.fields_cache.items():
+                    if value is not obj:
+                        obj._state.fields_cache.setdefault(name, value)
+            yield obj
+
+
+class SubmissionQuerySet(InheritanceQuerySet):
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._iterable_class = SubmissionIterable
+
+    def with_review_stats(self, user=None):
+        """
+        Annotate each submission with its ``review_count``, ``message_count``,
+        ``last_review_at`` and whether ``user`` has reviewed it
+        (``reviewed_by_me``).
+        """
+        reviews = Review.objects.filter(submission=OuterRef("pk")).order_by()
+        messages = SubmissionMessage.objects.filter(submission=OuterRef("pk")).order_by()
+        if user is None:
+            reviewed_by_me = Value(False, output_field=models.BooleanField())
+        else:
+            reviewed_by_me = Exists(reviews.filter(user=user))
+        # annotate once: select_subclasses() only copies the last annotate() call
+        return self.annotate(
+            review_count=Coalesce(SubqueryCount(reviews.values("pk")), 0),
+            message_count=Coalesce(SubqueryCount(messages.values("pk")), 0),
+            last_review_at=Subquery(
+                reviews.order_by("-submitted_at").values("submitted_at")[:1]
+            ),
+            reviewed_by_me=reviewed_by_me,
+        )
+
+    def assigned_to(self, user):
+        """
+        The submissions ``user`` is actively assigned to.
+
+        The user's assignments are read once off the ``(user, opted_out)``
+        index instead of being probed for every submission.
+        """
+        assignments = ReviewAssignment.objects.filter(user=user, opted_out=False)
+        return self.filter(pk__in=assignments.values("submission_id"))
+
+    def reviewed_by(self, user):
+        # annotated rather than filtered on directly, which needs Django 3.0
+        reviewed = Exists(Review.objects.filter(submission=OuterRef("pk"), user=user))
+        return self.annotate(_reviewed=reviewed).filter(_reviewed=True)
+
+    def not_reviewed_by(self, user):
+        """
+        The submissions ``user`` hasn't reviewed, as a ``NOT EXISTS``
+        anti-join on the ``(user, submission)`` index of reviews.
+        """
+        reviewed = Exists(Review.objects.filter(submission=OuterRef("pk"), user=user))
+        return self.annotate(_reviewed=reviewed).filter(_reviewed=False)
+
+    def review_queue(self, user):
+        """
+        The submissions still waiting for ``user``'s review: those they are
+        assigned to and haven't reviewed, leaving out cancelled submissions
+        and their own, annotated with their ``review_count`` and ordered by
+        fewest reviews, then oldest.
+        """
+        reviews = Review.objects.filter(submission=OuterRef("pk")).order_by().values("pk")
+        assignments = ReviewAssignment.objects.filter(
+            user=user,
+            opted_out=False,
+            submission__cancelled=False
+        )
+        # start from the user's assignments, not from every uncancelled submission
+        return self.filter(
+            pk__in=assignments.values("submission_id")
+        ).not_reviewed_by(user).exclude(
+            submitter=user
+        ).annotate(
+            review_count=Coalesce(SubqueryCount(reviews), 0)
+        ).order_by("review_count", "submitted", "pk")
+
+    def update_result(self, result, user=None):
+        """
+        Set the result of every submission in the queryset with a single
+        UPDATE, creating missing results in bulk and logging each change.
+
+        Unlike ``SubmissionBase.update_result`` this doesn't call the
+        per-submission ``accept()``/``reject()``/... methods.
+        """
+        status = RESULT_STATUSES[result]
+        with transaction.atomic(using=self.db):
+            old_statuses = dict(self.values_list("pk", "result__status"))
+            SubmissionResult.objects.create_missing(self)
+            SubmissionResult.objects.filter(
+                submission__in=list(old_statuses)
+            ).update(status=status)
+            logs = SubmissionResultLog.objects.bulk_create([
+                SubmissionResultLog(
+                    submission_id=pk,
+                    user=user,
+                    old_status=old_status or "undecided",
+                    new_status=status,
+                )
+                for pk, old_status in old_statuses.items()
+                if old_status != status
+            ])
+        # the UPDATE doesn't send post_save
+        hookset.bump_submission_versions(old_statuses)
+        return len(logs)
+
+
+SubmissionManager = InheritanceManager.from_queryset(SubmissionQuerySet)
+
+
 class SubmissionBase(models.Model):
 
     kind = models.ForeignKey(SubmissionKind, verbose_name=_("Kind"), on_delete=models.CASCADE)
@@ -41,13 +209,20 @@ class SubmissionBase(models.Model):
     )
     cancelled = models.BooleanField(default=False, verbose_name=_("Cancelled"))
 
-    objects = InheritanceManager()
+    objects = SubmissionManager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["cancelled", "submitted"]),
+            models.Index(fields=["submitted", "id"]),
+        ]
 
     def cancel(self):
         self.cancelled = True
         self.save()
 
-    def update_result(self, result):
+    def update_result(self, result, user=None):
+        old_status = self.result.status
         if result == "accept":
             self.accept()
         elif result == "reject":
@@ -56,22 +231,29 @@ class SubmissionBase(models.Model):
             self.undecide()
         elif result == "standby":
             self.standby()
+        if self.result.status != old_status:
+            SubmissionResultLog.objects.create(
+                submission=self,
+                user=user,
+                old_status=old_status,
+                new_status=self.result.status,
+            )
 
     def accept(self):
         self.result.status = "accepted"
-        self.result.save()
+        self.result.save(update_fields=["status"])
 
     def reject(self):
         self.result.status = "rejected"
-        self.result.save()
+        self.result.save(update_fields=["status"])
 
     def undecide(self):
         self.result.status = "undecided"
-        self.result.save()
+        self.result.save(update_fields=["status"])
 
     def standby(self):
         self.result.status = "standby"
-        self.result.save()
+        self.result.save(update_fields=["status"])
 
     def can_edit(self):
         return True
@@ -96,6 +278,27 @@ class SubmissionBase(models.Model):
         return f"<Submission pk={self.pk}, kind={self.kind}>"
 
 
+class SupportingDocumentManager(models.Manager):
+
+    def for_archive(self, reviewer=None, status=None):
+        """
+        The documents of non-cancelled submissions, optionally only those
+        actively assigned to ``reviewer`` or with the result ``status``,
+        ordered for a ZIP archive.
+        """
+        documents = self.filter(submission__cancelled=False)
+        if reviewer is not None:
+            documents = documents.filter(
+                submission__in=ReviewAssignment.objects.filter(
+                    user=reviewer,
+                    opted_out=False
+                ).values("submission")
+            )
+        if status:
+            documents = documents.filter(submission__result__status=status)
+        return documents.select_related("submission").order_by("submission", "pk")
+
+
 class SupportingDocument(models.Model):
     submission = models.ForeignKey(SubmissionBase, related_name="supporting_documents", verbose_name=_("Submission"), on_delete=models.CASCADE)
     uploaded_by = models.ForeignKey(settings.AUTH_USER_MODEL, verbose_name=_("Uploaded by"), on_delete=models.CASCADE)
@@ -103,6 +306,8 @@ class SupportingDocument(models.Model):
     document = models.FileField(upload_to=uuid_filename, verbose_name=_("Document"))
     description = models.CharField(max_length=140, verbose_name=_("Description"))
 
+    objects = SupportingDocumentManager()
+
     def download_url(self):
         return reverse("pinax_submissions:submission_document_download", args=[self.pk, os.path.basename(self.document.name).lower()])
 
@@ -126,10 +331,235 @@ class ReviewAssignment(models.Model):
     assigned_at = models.DateTimeField(default=timezone.now, verbose_name=_("Assigned at"))
     opted_out = models.BooleanField(default=False, verbose_name=_("Opted out"))
 
+    class Meta:
+        indexes = [
+            models.Index(fields=["user", "opted_out"]),
+        ]
+
     @classmethod
     def create_assignments(cls, submission, origin=AUTO_ASSIGNED_INITIAL):
         hookset.create_assignments(cls, submission, origin)
 
+    @classmethod
+    def create_bulk_assignments(cls, submissions, origin=AUTO_ASSIGNED_INITIAL, commit=True):
+        return hookset.create_bulk_assignments(cls, submissions, origin, commit)
+
+    def opt_out(self):
+        """
+        Opt the reviewer out of this assignment and assign a replacement.
+        """
+        return hookset.reassign(type(self), self)
+
+
+class ReviewerStatsManager(models.Manager):
+
+    def refresh(self, user_ids=None, create=True):
+        """
+        Recompute the stats of ``user_ids`` from their assignments and
+        reviews in a fixed number of queries, creating the missing rows
+        unless ``create`` is false. With no ``user_ids`` every reviewer's
+        stats are rebuilt.
+        """
+        assignments = ReviewAssignment.objects.order_by()
+        reviews = Review.objects.order_by()
+        if user_ids is not None:
+            user_ids = set(user_ids)
+            assignments = assignments.filter(user__in=user_ids)
+            reviews = reviews.filter(user__in=user_ids)
+        counts, turnaround = self.tally(reviews, assignments)
+
+        if user_ids is None:
+            user_ids = set(counts) | set(self.values_list("user_id", flat=True))
+        existing = self.in_bulk(user_ids, field_name="user_id")
+        if not create:
+            user_ids = set(existing)
+        stats = [existing.get(user_id) or self.model(user_id=user_id) for user_id in user_ids]
+        for obj in stats:
+            user_counts = counts[obj.user_id]
+            obj.assignment_count = user_counts["assignment_count"]
+            obj.review_count = user_counts["review_count"]
+            obj.outstanding_count = user_counts["outstanding_count"]
+            obj.opt_out_count = user_counts["opt_out_count"]
+            obj.total_turnaround = turnaround[obj.user_id]
+            obj.turnaround_count = user_counts["turnaround_count"]
+            obj.average_turnaround = obj.compute_average_turnaround()
+        self.bulk_update([obj for obj in stats if obj.pk], self.model.COUNTERS, batch_size=500)
+        self.bulk_create([obj for obj in stats if not obj.pk], batch_size=500, ignore_conflicts=True)
+        return len(stats)
+
+    def tally(self, reviews, assignments):
+        """
+        Tally ``reviews`` and ``assignments`` per user, returning a mapping
+        of user pk to counters and one of user pk to total turnaround.
+        """
+        assigned_at = ReviewAssignment.objects.filter(
+            user=OuterRef("user"),
+            submission=OuterRef("submission")
+        ).order_by("assigned_at").values("assigned_at")[:1]
+
+        counts = defaultdict(Counter)
+        turnaround = defaultdict(timedelta)
+        reviewed = set()
+        reviews = reviews.annotate(assigned_at=Subquery(assigned_at)).values_list(
+            "user", "submission", "submitted_at", "assigned_at"
+        )
+        for user_id, submission_id, submitted_at, assigned in reviews.iterator():
+            reviewed.add((user_id, submission_id))
+            counts[user_id]["review_count"] += 1
+            if assigned is not None and submitted_at >= assigned:
+                turnaround[user_id] += submitted_at - assigned
+                counts[user_id]["turnaround_count"] += 1
+        assignments = assignments.values_list("user", "submission", "opted_out")
+        for user_id, submission_id, opted_out in assignments.iterator():
+            if opted_out:
+                counts[user_id]["opt_out_count"] += 1
+            else:
+                counts[user_id]["assignment_count"] += 1
+                if (user_id, submission_id) not in reviewed:
+                    counts[user_id]["outstanding_count"] += 1
+        return counts, turnaround
+
+    def adjust(self, user_id, create=True, turnaround=timedelta(0), turnaround_count=0, **counters):
+        """
+        Add ``counters`` to the stats of ``user_id``, and ``turnaround``
+        over ``turnaround_count`` reviews to its turnaround. Stats that
+        don't exist yet are computed from scratch, unless ``create`` is
+        false.
+        """
+        counters = {name: delta for name, delta in counters.items() if delta}
+        if turnaround or turnaround_count:
+            # the average can't be portably computed in SQL, so lock the row
+            with transaction.atomic(using=self.db):
+                stats = self.select_for_update().filter(user_id=user_id).first()
+                if stats is not None:
+                    for name, delta in counters.items():
+                        setattr(stats, name, getattr(stats, name) + delta)
+                    stats.total_turnaround += turnaround
+                    stats.turnaround_count += turnaround_count
+                    stats.average_turnaround = stats.compute_average_turnaround()
+                    stats.save(update_fields=[*counters, "total_turnaround", "turnaround_count", "average_turnaround"])
+                    return
+        elif not counters or self.filter(user_id=user_id).update(**{
+            name: F(name) + delta for name, delta in counters.items()
+        }):
+            return
+        if create:
+            self.refresh([user_id])
+
+    def turnaround(self, submitted_at, assigned_at):
+        """
+        The total turnaround and number of the reviews submitted at
+        ``submitted_at`` for an assignment made at ``assigned_at``.
+        """
+        total, count = timedelta(0), 0
+        for submitted in submitted_at:
+            if assigned_at is not None and submitted >= assigned_at:
+                total += submitted - assigned_at
+                count += 1
+        return total, count
+
+    def review_changed(self, review, sign=1):
+        """
+        Count ``review`` as added or, with a ``sign`` of -1, deleted.
+        """
+        assignments = ReviewAssignment.objects.filter(
+            user=review.user_id,
+            submission=review.submission_id
+        ).aggregate(assigned_at=Min("assigned_at"), active=Count("pk", filter=Q(opted_out=False)))
+        reviewed = Review.objects.filter(
+            user=review.user_id,
+            submission=review.submission_id
+        ).exclude(pk=review.pk).exists()
+        turnaround, count = self.turnaround([review.submitted_at], assignments["assigned_at"])
+        self.adjust(
+            review.user_id,
+            create=sign > 0,
+            review_count=sign,
+            outstanding_count=0 if reviewed else -sign * assignments["active"],
+            turnaround=sign * turnaround,
+            turnaround_count=sign * count,
+        )
+
+    def assignment_changed(self, assignment, sign=1):
+        """
+        Count ``assignment`` as added or, with a ``sign`` of -1, deleted.
+        """
+        submitted_at = list(Review.objects.filter(
+            user=assignment.user_id,
+            submission=assignment.submission_id
+        ).values_list("submitted_at", flat=True))
+        if assignment.opted_out:
+            counters = {"opt_out_count": sign}
+        else:
+            counters = {"assignment_count": sign, "outstanding_count": 0 if submitted_at else sign}
+
+        turnaround, count = timedelta(0), 0
+        if submitted_at:
+            # reviews are timed from the first assignment, which this may be
+            others = ReviewAssignment.objects.filter(
+                user=assignment.user_id,
+                submission=assignment.submission_id
+            ).exclude(pk=assignment.pk).aggregate(assigned_at=Min("assigned_at"))["assigned_at"]
+            first = assignment.assigned_at if others is None else min(others, assignment.assigned_at)
+            if first != others:
+                old_total, old_count = self.turnaround(submitted_at, others)
+                new_total, new_count = self.turnaround(submitted_at, first)
+                turnaround, count = sign * (new_total - old_total), sign * (new_count - old_count)
+        self.adjust(assignment.user_id, create=sign > 0, turnaround=turnaround, turnaround_count=count, **counters)
+
+    def assignment_opted_out(self, assignment):
+        """
+        Count the opt out of the active ``assignment``.
+        """
+        reviewed = Review.objects.filter(user=assignment.user_id, submission=assignment.submission_id).exists()
+        self.adjust(
+            assignment.user_id,
+            assignment_count=-1,
+            outstanding_count=0 if reviewed else -1,
+            opt_out_count=1,
+        )
+
+
+class ReviewerStats(models.Model):
+    """
+    Per-reviewer counters materialized from assignments and reviews, kept
+    up to date incrementally by signals (see ``receivers``) and rebuilt
+    from scratch by the ``rebuild_reviewer_stats`` command. Picking the least loaded
+    reviewer or listing reviewers with their stats is a single indexed read.
+    """
+    COUNTERS = [
+        "assignment_count",
+        "review_count",
+        "outstanding_count",
+        "opt_out_count",
+        "total_turnaround",
+        "turnaround_count",
+        "average_turnaround",
+    ]
+
+    user = models.OneToOneField(settings.AUTH_USER_MODEL, related_name="reviewer_stats", verbose_name=_("User"), on_delete=models.CASCADE)
+    assignment_count = models.PositiveIntegerField(default=0, verbose_name=_("Assignment count"))
+    review_count = models.PositiveIntegerField(default=0, verbose_name=_("Review count"))
+    outstanding_count = models.PositiveIntegerField(default=0, verbose_name=_("Outstanding count"))
+    opt_out_count = models.PositiveIntegerField(default=0, verbose_name=_("Opt-out count"))
+    total_turnaround = models.DurationField(default=timedelta(0), verbose_name=_("Total turnaround"))
+    turnaround_count = models.PositiveIntegerField(default=0, verbose_name=_("Turnaround count"))
+    average_turnaround = models.DurationField(null=True, blank=True, verbose_name=_("Average turnaround"))
+
+    objects = ReviewerStatsManager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["assignment_count", "user"]),
+        ]
+        verbose_name = _("reviewer stats")
+        verbose_name_plural = _("reviewer stats")
+
+    def compute_average_turnaround(self):
+        if not self.turnaround_count:
+            return None
+        return self.total_turnaround / self.turnaround_count
+
 
 class SubmissionMessage(models.Model):
     submission = models.ForeignKey(SubmissionBase, related_name="messages", verbose_name=_("Submission"), on_delete=models.CASCADE)
@@ -162,6 +592,81 @@ class Review(models.Model):
     class Meta:
         verbose_name = _("review")
         verbose_name_plural = _("reviews")
+        indexes = [
+            models.Index(fields=["user", "submission"]),
+        ]
+
+
+class SearchDocumentManager(models.Manager):
+
+    def text_fields(self, submission):
+        """
+        The text fields added by ``submission``'s concrete subclass.
+        """
+        return [
+            field for field in submission._meta.concrete_fields
+            if field.model is not SubmissionBase and isinstance(field, (models.CharField, models.TextField))
+        ]
+
+    def update_for(self, submission_ids, create=True):
+        """
+        Rebuild the documents of ``submission_ids`` from the subclass text
+        fields, review comments and messages of each submission, deleting
+        those of submissions that no longer exist and, unless ``create`` is
+        set, only updating documents that already exist. Returns a dict
+        mapping the pk of each indexed submission to its text.
+        """
+        submission_ids = set(submission_ids)
+        parts = defaultdict(list)
+        for submission in SubmissionBase.objects.filter(pk__in=submission_ids).select_subclasses():
+            parts[submission.pk].extend(
+                getattr(submission, field.attname) or "" for field in self.text_fields(submission)
+            )
+        for model, field in [(Review, "comment"), (SubmissionMessage, "message")]:
+            rows = model.objects.filter(submission__in=list(parts)).values_list("submission_id", field)
+            for submission_id, text in rows.order_by("pk"):
+                parts[submission_id].append(text)
+        texts = {pk: "\n".join(text for text in values if text) for pk, values in parts.items()}
+
+        with transaction.atomic():
+            self.filter(pk__in=submission_ids - set(texts)).delete()
+            existing = self.in_bulk(list(texts))
+            if not create:
+                texts = {pk: text for pk, text in texts.items() if pk in existing}
+            changed = []
+            for pk, text in texts.items():
+                if pk in existing and existing[pk].text != text:
+                    existing[pk].text = text
+                    changed.append(existing[pk])
+            self.bulk_update(changed, ["text"])
+            self.bulk_create([self.model(submission_id=pk, text=texts[pk]) for pk in texts if pk not in existing])
+        return texts
+
+
+class SearchDocument(models.Model):
+    """
+    The searchable text of a submission, kept up to date by signals (see
+    ``receivers``) and indexed by the configured search backend (see
+    ``search``).
+    """
+    submission = models.OneToOneField(SubmissionBase, primary_key=True, related_name="search_document", verbose_name=_("Submission"), on_delete=models.CASCADE)
+    text = models.TextField(blank=True, verbose_name=_("Text"))
+
+    objects = SearchDocumentManager()
+
+    class Meta:
+        verbose_name = _("search document")
+        verbose_name_plural = _("search documents")
+
+
+class SubmissionResultManager(models.Manager):
+
+    def create_missing(self, submissions):
+        """
+        Create the results missing for ``submissions`` with one INSERT.
+        """
+        missing = submissions.filter(result__isnull=True).values_list("pk", flat=True)
+        return self.bulk_create([self.model(submission_id=pk) for pk in missing])
 
 
 class SubmissionResult(models.Model):
@@ -178,17 +683,35 @@ class SubmissionResult(models.Model):
         ("standby", _("standby")),
     ], default="undecided", verbose_name=_("Status"))
 
+    objects = SubmissionResultManager()
+
     @property
     def accepted(self):
         return self.status == "accepted"
 
     @property
     def comment_count(self):
-        self.submssion.reviews.count()
+        return self.submission.reviews.count()
 
     class Meta:
         verbose_name = _("submission result")
         verbose_name_plural = _("submission results")
+        indexes = [
+            models.Index(fields=["status", "submission"]),
+        ]
+
+
+class SubmissionResultLog(models.Model):
+    submission = models.ForeignKey(SubmissionBase, related_name="result_log", verbose_name=_("Submission"), on_delete=models.CASCADE)
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, null=True, blank=True, verbose_name=_("User"), on_delete=models.SET_NULL)
+    old_status = models.CharField(max_length=20, verbose_name=_("Old status"))
+    new_status = models.CharField(max_length=20, verbose_name=_("New status"))
+    timestamp = models.DateTimeField(default=timezone.now, verbose_name=_("Timestamp"))
+
+    class Meta:
+        ordering = ["timestamp"]
+        verbose_name = _("submission result log entry")
+        verbose_name_plural = _("submission result log")
 
 
 class Comment(models.Model):
@@ -206,7 +729,7 @@ class Comment(models.Model):
         verbose_name_plural = _("comments")
 
     def save(self, *args, **kwargs):
-        self.comment_html = hookset.parse_content(self.comment)
+        self.text_html = hookset.parse_content(self.text)
         return super().save(*args, **kwargs)
 
 
@@ -221,6 +744,59 @@ class NotificationTemplate(models.Model):
         verbose_name_plural = _("notification templates")
 
 
+class ResultNotificationManager(models.Manager):
+
+    def send(self, submissions, template, from_address, subject, body, batch=""):
+        """
+        Render ``body`` for each of ``submissions`` and record and send the
+        resulting notifications chunk by chunk. Returns the number of
+        notifications.
+
+        Emails are queued under ``batch`` so progress can be followed with
+        ``QueuedEmail.objects.progress``, or sent over one connection when
+        ``PINAX_SUBMISSIONS_EMAIL_QUEUE`` is disabled.
+        """
+        from .conf import settings  # if put globally there is a race condition
+
+        chunk_size = settings.PINAX_SUBMISSIONS_NOTIFICATION_CHUNK_SIZE
+        body_template = Template(body)
+        connection = None
+        if not settings.PINAX_SUBMISSIONS_EMAIL_QUEUE:
+            connection = get_connection()
+            connection.open()
+        count = 0
+        try:
+            submissions = submissions.iterator(chunk_size=chunk_size)
+            while True:
+                notifications = [
+                    self.model(
+                        submission=submission,
+                        template=template,
+                        to_address=submission.submitter.email,
+                        from_address=from_address,
+                        subject=subject,
+                        body=body_template.render(Context({
+                            "submission": submission.notification_email_context()
+                        })),
+                    )
+                    for submission in itertools.islice(submissions, chunk_size)
+                ]
+                if not notifications:
+                    break
+                with transaction.atomic(using=self.db):
+                    self.bulk_create(notifications)
+                    messages = [notification.as_message() for notification in notifications]
+                    if connection is None:
+                        QueuedEmail.objects.enqueue(messages, batch=batch)
+                if connection is not None:
+                    connection.send_messages(messages)
+                count += len(notifications)
+        finally:
+            if connection is not None:
+                connection.close()
+        return count
+
+
 class ResultNotification(models.Model):
     submission = models.ForeignKey(SubmissionBase, related_name="notifications", verbose_name=_("Submission"), on_delete=models.CASCADE)
     template = models.ForeignKey(NotificationTemplate, null=True, blank=True, on_delete=models.SET_NULL, verbose_name=_("Template"))
@@ -230,5 +806,176 @@ class ResultNotification(models.Model):
     subject = models.CharField(max_length=100, verbose_name=_("Subject"))
     body = models.TextField(verbose_name=_("Body"))
 
+    objects = ResultNotificationManager()
+
+    def recipients(self):
+        return [self.to_address]
+
     def email_args(self):
         return (self.subject, self.body, self.from_address, self.recipients())
+
+    def as_message(self):
+        return EmailMessage(*self.email_args())
+
+
+class QueuedEmailManager(models.Manager):
+
+    def enqueue(self, messages, batch=""):
+        """
+        Store ``messages`` (``EmailMessage`` instances) for delivery by the
+        ``send_queued_email`` command, using a single INSERT.
+        """
+        emails = [self.model.from_message(message, batch=batch) for message in messages]
+        return self.bulk_create(emails)
+
+    def progress(self, batch):
+        """
+        Count the emails of ``batch`` by status, in one grouped query.
+        """
+        counts = dict.fromkeys(
+            [self.model.STATUS_QUEUED, self.model.STATUS_SENT, self.model.STATUS_FAILED],
+            0
+        )
+        for row in self.filter(batch=batch).values("status").annotate(count=Count("pk")).order_by():
+            counts[row["status"]] = row["count"]
+        counts["total"] = sum(counts.values())
+        return counts
+
+    def due(self):
+        return self.filter(
+            status=self.model.STATUS_QUEUED,
+            next_attempt_at__lte=timezone.now(),
+        ).order_by("next_attempt_at", "pk")
+
+    def claim(self, batch_size):
+        """
+        Lock a batch of due emails just long enough to push their
+        ``next_attempt_at`` past ``PINAX_SUBMISSIONS_EMAIL_CLAIM_TIMEOUT``,
+        so other workers skip them while they are sent and they are retried
+        if this worker dies before recording the outcome.
+        """
+        from .conf import settings  # if put globally there is a race condition
+
+        with transaction.atomic(using=self.db):
+            skip_locked = connections[self.db].features.has_select_for_update_skip_locked
+            emails = list(self.due().select_for_update(skip_locked=skip_locked)[:batch_size])
+            claimed_until = timezone.now() + timedelta(seconds=settings.PINAX_SUBMISSIONS_EMAIL_CLAIM_TIMEOUT)
+            self.filter(pk__in=[email.pk for email in emails]).update(next_attempt_at=claimed_until)
+        return emails
+
+    def send_queued(self, batch_size=None, connection=None):
+        """
+        Send one batch of due emails over a single connection, returning the
+        number of emails sent and the number that failed.
+
+        The emails are claimed in a short transaction and sent outside it,
+        so no row locks are held during network I/O. If the connection
+        can't be opened every email of the batch counts as a failed attempt.
+        """
+        from .conf import settings  # if put globally there is a race condition
+
+        batch_size = batch_size or settings.PINAX_SUBMISSIONS_EMAIL_BATCH_SIZE
+        connection = connection or get_connection()
+        sent = failed = 0
+        emails = self.claim(batch_size)
+        if not emails:
+            return sent, failed
+        try:
+            connection.open()
+        except Exception as e:
+            for email in emails:
+                email.mark_failed(e)
+            failed = len(emails)
+        else:
+            try:
+                for email in emails:
+                    try:
+                        connection.send_messages([email.as_message()])
+                    except Exception as e:
+                        email.mark_failed(e)
+                        failed += 1
+                    else:
+                        email.mark_sent()
+                        sent += 1
+            finally:
+                connection.close()
+        self.bulk_update(emails, ["status", "attempts", "next_attempt_at", "sent_at", "last_error"])
+        return sent, failed
+
+
+class QueuedEmail(models.Model):
+    STATUS_QUEUED = "queued"
+    STATUS_SENT = "sent"
+    STATUS_FAILED = "failed"
+
+    STATUS_CHOICES = [
+        (STATUS_QUEUED, _("queued")),
+        (STATUS_SENT, _("sent")),
+        (STATUS_FAILED, _("failed")),
+    ]
+
+    from_email = models.CharField(max_length=254, verbose_name=_("From"))
+    to = models.TextField(verbose_name=_("To"))
+    subject = models.CharField(max_length=255, verbose_name=_("Subject"))
+    body = models.TextField(verbose_name=_("Body"))
+    html_body = models.TextField(blank=True, verbose_name=_("HTML body"))
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=STATUS_QUEUED, verbose_name=_("Status"))
+    attempts = models.PositiveIntegerField(default=0, verbose_name=_("Attempts"))
+    created_at = models.DateTimeField(default=timezone.now, verbose_name=_("Created at"))
+    next_attempt_at = models.DateTimeField(default=timezone.now, verbose_name=_("Next attempt at"))
+    sent_at = models.DateTimeField(null=True, blank=True, verbose_name=_("Sent at"))
+    last_error = models.TextField(blank=True, verbose_name=_("Last error"))
+    batch = models.CharField(max_length=36, blank=True, db_index=True, verbose_name=_("Batch"))
+
+    objects = QueuedEmailManager()
+
+    class Meta:
+        verbose_name = _("queued email")
+        verbose_name_plural = _("queued emails")
+        indexes = [
+            models.Index(fields=["status", "next_attempt_at"]),
+        ]
+
+    @classmethod
+    def from_message(cls, message, batch=""):
+        html_body = ""
+        for content, mimetype in getattr(message, "alternatives", []):
+            if mimetype == "text/html":
+                html_body = content
+        return cls(
+            from_email=message.from_email,
+            to="\n".join(message.to),
+            subject=message.subject,
+            body=message.body,
+            html_body=html_body,
+            batch=batch,
+        )
+
+    def as_message(self):
+        message = EmailMultiAlternatives(
+            self.subject,
+            self.body,
+            self.from_email,
+            self.to.splitlines()
+        )
+        if self.html_body:
+            message.attach_alternative(self.html_body, "text/html")
+        return message
+
+    def mark_sent(self):
+        self.status = self.STATUS_SENT
+        self.attempts += 1
+        self.sent_at = timezone.now()
+        self.last_error = ""
+
+    def mark_failed(self, error):
+        from .conf import settings  # if put globally there is a race condition
+
+        self.attempts += 1
+        self.last_error = str(error)
+        if self.attempts >= settings.PINAX_SUBMISSIONS_EMAIL_MAX_ATTEMPTS:
+            self.status = self.STATUS_FAILED
+        else:
+            # exponential backoff: 1, 2, 4, 8... times the retry delay
+            delay = settings.PINAX_SUBMISSIONS_EMAIL_RETRY_DELAY * 2 ** (self.attempts - 1)
+            self.next_attempt_at = timezone.now() + timedelta(seconds=delay)
@@ -0,0 +1,122 @@
+import base64
+import binascii
+
+from django.db.models import Q
+from django.http import Http404
+from django.utils.dateparse import parse_datetime
+from django.utils.translation import ugettext_lazy as _
+
+from .conf import settings
+
+
+class InvalidCursor(Exception):
+    pass
+
+
+class KeysetPage:
+
+    def __init__(self, object_list, paginator, has_next, has_previous):
+        self.object_list = object_list
+        self.paginator = paginator
+        self._has_next = has_next
+        self._has_previous = has_previous
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def has_next(self):
+        return self._has_next
+
+    def has_previous(self):
+        return self._has_previous
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+    @property
+    def next_cursor(self):
+        if self.has_next():
+            return self.paginator.encode_cursor(self.object_list[-1])
+
+    @property
+    def previous_cursor(self):
+        if self.has_previous():
+            return self.paginator.encode_cursor(self.object_list[0])
+
+
+class KeysetPaginator:
+    """
+    Pages through submissions ordered by ``submitted`` and ``pk``.
+
+    Instead of an OFFSET, each page starts from a cursor pointing at the
+    last (or first) row of the neighbouring page, so fetching a page costs
+    the same wherever it is in the list.
+    """
+
+    def __init__(self, queryset, per_page):
+        self.queryset = queryset
+        self.per_page = per_page
+
+    def encode_cursor(self, obj):
+        value = f"{obj.submitted.isoformat()}|{obj.pk}"
+        return base64.urlsafe_b64encode(value.encode()).decode()
+
+    def decode_cursor(self, cursor):
+        try:
+            value = base64.urlsafe_b64decode(cursor.encode()).decode()
+            submitted, pk = value.rsplit("|", 1)
+            submitted, pk = parse_datetime(submitted), int(pk)
+        except (binascii.Error, UnicodeError, ValueError):
+            raise InvalidCursor(cursor)
+        if submitted is None:
+            raise InvalidCursor(cursor)
+        return submitted, pk
+
+    def page(self, after=None, before=None):
+        queryset = self.queryset
+        if before:
+            submitted, pk = self.decode_cursor(before)
+            queryset = queryset.filter(
+                Q(submitted__lt=submitted) | Q(submitted=submitted, pk__lt=pk)
+            ).order_by("-submitted", "-pk")
+        else:
+            if after:
+                submitted, pk = self.decode_cursor(after)
+                queryset = queryset.filter(
+                    Q(submitted__gt=submitted) | Q(submitted=submitted, pk__gt=pk)
+                )
+            queryset = queryset.order_by("submitted", "pk")
+
+        object_list = list(queryset[:self.per_page + 1])
+        has_more = len(object_list) > self.per_page
+        object_list = object_list[:self.per_page]
+        if before:
+            object_list.reverse()
+            return KeysetPage(object_list, self, has_next=True, has_previous=has_more)
+        return KeysetPage(object_list, self, has_next=has_more, has_previous=bool(after))
+
+
+class KeysetPaginationMixin:
+    """
+    Keyset pagination for list views, driven by the ``after`` and
+    ``before`` cursors in the query string.
+    """
+
+    paginator_class = KeysetPaginator
+
+    def get_paginate_by(self, queryset):
+        return settings.PINAX_SUBMISSIONS_PAGE_SIZE
+
+    def paginate_queryset(self, queryset, page_size):
+        paginator = self.paginator_class(queryset, page_size)
+        try:
+            page = paginator.page(
+                after=self.request.GET.get("after"),
+                before=self.request.GET.get("before"),
+            )
+        except InvalidCursor:
+            raise Http404(_("Invalid page."))
+        return (paginator, page, page.object_list, page.has_other_pages())
@@ -0,0 +1,94 @@
+from django.utils.functional import SimpleLazyObject
+
+from .conf import settings
+from .hooks import hookset
+
+SESSION_KEY = "pinax_submissions_capabilities"
+
+
+class Capabilities:
+    """
+    What a user may do in the submissions app, worked out once from the
+    user's cached permissions and then read as plain attributes by views
+    and templates.
+    """
+
+    PERMISSIONS = {
+        "can_review": "reviews.can_review_submissions",
+        "can_manage": "reviews.can_manage",
+        "can_add_review": "submissions.add_review",
+    }
+
+    def __init__(self, **values):
+        self.values = values
+
+    def __getattr__(self, name):
+        try:
+            return self.__dict__["values"][name]
+        except KeyError:
+            raise AttributeError(name)
+
+    @classmethod
+    def for_user(cls, user):
+        if not user.is_authenticated:
+            return cls(**{name: False for name in cls.PERMISSIONS})
+        if user.is_active and user.is_superuser:
+            return cls(**{name: True for name in cls.PERMISSIONS})
+        perms = hookset.user_permissions(user)
+        return cls(**{name: perm in perms for name, perm in cls.PERMISSIONS.items()})
+
+    @classmethod
+    def for_request(cls, request):
+        """
+        The capabilities of ``request.user``, reused from the session when
+        ``PINAX_SUBMISSIONS_CAPABILITIES_IN_SESSION`` is set and nothing
+        has changed permissions since they were stored.
+        """
+        session = getattr(request, "session", None)
+        if session is None or not settings.PINAX_SUBMISSIONS_CAPABILITIES_IN_SESSION:
+            return cls.for_user(request.user)
+
+        version = hookset.permissions_version()
+        stored = session.get(SESSION_KEY)
+        if stored and stored["user"] == request.user.pk and stored["version"] == version:
+            return cls(**stored["values"])
+        capabilities = cls.for_user(request.user)
+        session[SESSION_KEY] = {
+            "user": request.user.pk,
+            "version": version,
+            "values": capabilities.values,
+        }
+        return capabilities
+
+
+def get_capabilities(request):
+    """
+    Return the ``Capabilities`` of the request's user, computing them at
+    most once per request (``CapabilitiesMiddleware`` sets them up lazily).
+    """
+    if not hasattr(request, "submission_capabilities"):
+        request.submission_capabilities = Capabilities.for_request(request)
+    return request.submission_capabilities
+
+
+class CapabilitiesMiddleware:
+    """
+    Attach a lazily computed ``request.submission_capabilities``.
+
+    Must come after ``AuthenticationMiddleware`` (and
+    ``SessionMiddleware`` to cache them in the session).
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        request.submission_capabilities = SimpleLazyObject(lambda: Capabilities.for_request(request))
+        return self.get_response(request)
+
+
+def capabilities(request):
+    """
+    Context processor exposing ``submission_capabilities`` to templates.
+    """
+    return {"submission_capabilities": SimpleLazyObject(lambda: get_capabilities(request))}
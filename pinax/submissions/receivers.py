@@ -0,0 +1,137 @@
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import Group, Permission
+from django.db import transaction
+from django.db.models.signals import (
+    m2m_changed,
+    post_delete,
+    post_save,
+    pre_save,
+)
+from django.dispatch import receiver
+
+from .hooks import hookset
+from .models import (
+    Review,
+    ReviewAssignment,
+    ReviewerStats,
+    SearchDocument,
+    SubmissionBase,
+    SubmissionMessage,
+    SubmissionResult,
+    SupportingDocument,
+)
+from .search import remove_from_index, update_index
+
+
+@receiver(post_save)
+def create_submission_result(sender, instance, created, raw=False, **kwargs):
+    # sent with the concrete subclass as sender, so we can't filter on it
+    if created and not raw and isinstance(instance, SubmissionBase):
+        SubmissionResult.objects.get_or_create(submission=instance)
+
+
+@receiver(post_save)
+def bump_submission_version(sender, instance, raw=False, **kwargs):
+    if not raw and isinstance(instance, SubmissionBase):
+        hookset.bump_submission_versions([instance.pk])
+
+
+@receiver(post_save, sender=Review)
+@receiver(post_save, sender=ReviewAssignment)
+@receiver(post_save, sender=SubmissionMessage)
+@receiver(post_save, sender=SubmissionResult)
+@receiver(post_save, sender=SupportingDocument)
+@receiver(post_delete, sender=Review)
+@receiver(post_delete, sender=ReviewAssignment)
+@receiver(post_delete, sender=SubmissionMessage)
+@receiver(post_delete, sender=SubmissionResult)
+@receiver(post_delete, sender=SupportingDocument)
+def bump_related_submission_version(sender, instance, raw=False, **kwargs):
+    if not raw:
+        hookset.bump_submission_versions([instance.submission_id])
+
+
+@receiver(post_save, sender=Review)
+def update_reviewer_stats_for_review(sender, instance, created, raw=False, **kwargs):
+    # the fields the stats depend on don't change once a review is created
+    if created and not raw:
+        ReviewerStats.objects.review_changed(instance)
+
+
+@receiver(post_save, sender=ReviewAssignment)
+def update_reviewer_stats_for_assignment(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    if created:
+        ReviewerStats.objects.assignment_changed(instance)
+    else:
+        # what changed isn't known, but edits outside ``reassign`` are rare
+        ReviewerStats.objects.refresh([instance.user_id])
+
+
+@receiver(post_delete, sender=Review)
+def update_reviewer_stats_on_review_delete(sender, instance, **kwargs):
+    # the user may be being deleted too, so no row is created for them
+    ReviewerStats.objects.review_changed(instance, sign=-1)
+
+
+@receiver(post_delete, sender=ReviewAssignment)
+def update_reviewer_stats_on_assignment_delete(sender, instance, **kwargs):
+    ReviewerStats.objects.assignment_changed(instance, sign=-1)
+
+
+@receiver(post_save)
+def update_submission_search_index(sender, instance, raw=False, **kwargs):
+    if not raw and isinstance(instance, SubmissionBase):
+        update_index([instance.pk])
+
+
+@receiver(post_save, sender=Review)
+@receiver(post_save, sender=SubmissionMessage)
+def update_search_index(sender, instance, raw=False, **kwargs):
+    if not raw:
+        update_index([instance.submission_id])
+
+
+@receiver(post_delete, sender=Review)
+@receiver(post_delete, sender=SubmissionMessage)
+def update_search_index_on_delete(sender, instance, **kwargs):
+    # the submission may be being deleted too, so don't recreate its document
+    update_index([instance.submission_id], create=False)
+
+
+@receiver(post_delete, sender=SearchDocument)
+def remove_from_search_index(sender, instance, **kwargs):
+    remove_from_index([instance.pk])
+
+
+@receiver(m2m_changed, sender=get_user_model().groups.through)
+@receiver(m2m_changed, sender=get_user_model().user_permissions.through)
+@receiver(m2m_changed, sender=Group.permissions.through)
+def invalidate_permissions(sender, action, **kwargs):
+    if action in ("post_add", "post_remove", "post_clear"):
+        hookset.invalidate_permissions()
+
+
+@receiver(post_delete, sender=Group)
+@receiver(post_delete, sender=Permission)
+def invalidate_permissions_on_delete(sender, **kwargs):
+    hookset.invalidate_permissions()
+
+
+USER_FLAGS = ["is_superuser", "is_staff", "is_active"]
+
+
+@receiver(pre_save, sender=get_user_model())
+def invalidate_permissions_on_user_flags(sender, instance, raw=False, update_fields=None, **kwargs):
+    if raw or instance.pk is None:
+        return
+    fields = [field for field in USER_FLAGS if hasattr(instance, field)]
+    if update_fields is not None:
+        # skips saves like the ``last_login`` update on every login
+        fields = [field for field in fields if field in update_fields]
+    if not fields:
+        return
+    old = sender._default_manager.filter(pk=instance.pk).values(*fields).first()
+    if old is not None and any(old[field] != getattr(instance, field) for field in fields):
+        transaction.on_commit(hookset.invalidate_permissions)
@@ -0,0 +1,237 @@
+import functools
+import heapq
+import math
+import re
+import threading
+import uuid
+from collections import Counter, defaultdict
+
+from django.core.cache import caches
+from django.db import connections, transaction
+
+from .conf import settings
+from .models import SearchDocument, SubmissionBase
+
+TOKEN_RE = re.compile(r"\w+")
+
+
+def tokenize(text):
+    return TOKEN_RE.findall(text.lower())
+
+
+class SearchBackend:
+    """
+    Keeps ``SearchDocument`` rows up to date and finds the submissions
+    whose document contains every word of a query, best matches first.
+    """
+
+    def available(self):
+        return True
+
+    def connection(self):
+        return connections[SearchDocument.objects.db]
+
+    def update(self, submission_ids, create=True):
+        return SearchDocument.objects.update_for(submission_ids, create=create)
+
+    def remove(self, submission_ids):
+        """
+        Called once the documents of ``submission_ids`` have been deleted.
+        """
+
+    def rebuild(self, batch_size=500):
+        pks = list(SubmissionBase.objects.order_by("pk").values_list("pk", flat=True))
+        for start in range(0, len(pks), batch_size):
+            self.update(pks[start:start + batch_size])
+        return len(pks)
+
+    def search(self, query, limit):
+        raise NotImplementedError()
+
+
+class SQLiteBackend(SearchBackend):
+    """
+    Queries the FTS5 table that triggers keep in step with the
+    ``SearchDocument`` table (created by migration ``0009``), ranked by
+    BM25.
+    """
+
+    def available(self):
+        connection = self.connection()
+        if connection.vendor != "sqlite":
+            return False
+        return "submissions_searchdocument_fts" in connection.introspection.table_names()
+
+    def search(self, query, limit):
+        terms = tokenize(query)
+        if not terms:
+            return []
+        match = " ".join(f'"{term}"' for term in terms)
+        with self.connection().cursor() as cursor:
+            cursor.execute(
+                "SELECT rowid FROM submissions_searchdocument_fts "
+                "WHERE submissions_searchdocument_fts MATCH %s ORDER BY rank LIMIT %s",
+                [match, limit]
+            )
+            return [row[0] for row in cursor.fetchall()]
+
+
+class PostgreSQLBackend(SearchBackend):
+    """
+    Queries the generated, GIN indexed ``search_vector`` column (added by
+    migration ``0009`` on PostgreSQL 12 and later), ranked by ``ts_rank``.
+    """
+
+    def available(self):
+        connection = self.connection()
+        if connection.vendor != "postgresql":
+            return False
+        with connection.cursor() as cursor:
+            columns = connection.introspection.get_table_description(cursor, SearchDocument._meta.db_table)
+        return "search_vector" in {column.name for column in columns}
+
+    def search(self, query, limit):
+        if not tokenize(query):
+            return []
+        with self.connection().cursor() as cursor:
+            cursor.execute(
+                "SELECT submission_id FROM submissions_searchdocument, plainto_tsquery('english', %s) query "
+                "WHERE search_vector @@ query "
+                "ORDER BY ts_rank(search_vector, query) DESC, submission_id LIMIT %s",
+                [query, limit]
+            )
+            return [row[0] for row in cursor.fetchall()]
+
+
+class PythonBackend(SearchBackend):
+    """
+    An inverted index held in memory and ranked by TF-IDF, for databases
+    without full-text search.
+
+    It is loaded from the ``SearchDocument`` table on first use and kept
+    up to date by this process's updates once they commit; a version token
+    in the ``PINAX_SUBMISSIONS_SEARCH_CACHE`` makes other processes reload
+    it after an update.
+    """
+
+    version_key = "pinax-submissions:search-version"
+
+    def __init__(self):
+        self.lock = threading.RLock()
+        self.version = None
+        self.postings = defaultdict(dict)
+        self.terms = {}
+
+    def cache(self):
+        return caches[settings.PINAX_SUBMISSIONS_SEARCH_CACHE]
+
+    def current_version(self):
+        cache = self.cache()
+        version = cache.get(self.version_key)
+        if version is None:
+            cache.add(self.version_key, uuid.uuid4().hex, None)
+            version = cache.get(self.version_key)
+        return version
+
+    def bump_version(self):
+        self.version = uuid.uuid4().hex
+        self.cache().set(self.version_key, self.version, None)
+
+    def add(self, submission_id, text):
+        terms = Counter(tokenize(text))
+        self.terms[submission_id] = terms
+        for term, count in terms.items():
+            self.postings[term][submission_id] = count
+
+    def discard(self, submission_id):
+        for term in self.terms.pop(submission_id, ()):
+            self.postings[term].pop(submission_id, None)
+            if not self.postings[term]:
+                del self.postings[term]
+
+    def load(self):
+        with self.lock:
+            version = self.current_version()
+            if version == self.version:
+                return
+            self.postings = defaultdict(dict)
+            self.terms = {}
+            for submission_id, text in SearchDocument.objects.values_list("pk", "text").iterator():
+                self.add(submission_id, text)
+            self.version = version
+
+    def apply(self, submission_ids, texts):
+        with self.lock:
+            self.load()
+            for submission_id in submission_ids:
+                self.discard(submission_id)
+            for submission_id, text in texts.items():
+                self.add(submission_id, text)
+            self.bump_version()
+
+    def update(self, submission_ids, create=True):
+        submission_ids = list(submission_ids)
+        texts = super().update(submission_ids, create=create)
+        # until then other processes would reload the old documents
+        transaction.on_commit(lambda: self.apply(submission_ids, texts), using=SearchDocument.objects.db)
+        return texts
+
+    def remove(self, submission_ids):
+        submission_ids = list(submission_ids)
+        transaction.on_commit(lambda: self.apply(submission_ids, {}), using=SearchDocument.objects.db)
+
+    def search(self, query, limit):
+        terms = set(tokenize(query))
+        if not terms:
+            return []
+        with self.lock:
+            self.load()
+            postings = sorted((self.postings.get(term, {}) for term in terms), key=len)
+            matches = set(postings[0]).intersection(*postings[1:])
+            total = len(self.terms)
+            weights = [(posting, math.log(1 + total / len(posting))) for posting in postings if posting]
+        scores = (
+            (sum(posting[pk] * weight for posting, weight in weights), -pk)
+            for pk in matches
+        )
+        return [-pk for score, pk in heapq.nlargest(limit, scores)]
+
+
+BACKENDS = [SQLiteBackend, PostgreSQLBackend, PythonBackend]
+
+
+@functools.lru_cache(maxsize=None)
+def default_backend():
+    for cls in BACKENDS:
+        backend = cls()
+        if backend.available():
+            return backend
+
+
+def get_backend():
+    """
+    The ``PINAX_SUBMISSIONS_SEARCH_BACKEND`` or, if it isn't set, the first
+    of ``BACKENDS`` that the database supports.
+    """
+    return settings.PINAX_SUBMISSIONS_SEARCH_BACKEND or default_backend()
+
+
+def update_index(submission_ids, create=True):
+    return get_backend().update(submission_ids, create=create)
+
+
+def remove_from_index(submission_ids):
+    get_backend().remove(submission_ids)
+
+
+def rebuild_index(batch_size=500):
+    return get_backend().rebuild(batch_size=batch_size)
+
+
+def search_submissions(query, limit=None):
+    """
+    Return the pks of the submissions matching ``query``, best first.
+    """
+    if limit is None:
+        limit = settings.PINAX_SUBMISSIONS_SEARCH_LIMIT
+    return get_backend().search(query, limit)
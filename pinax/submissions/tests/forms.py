@@ -0,0 +1,10 @@
+from django import forms
+
+from .models import TalkSubmission
+
+
+class TalkSubmissionForm(forms.ModelForm):
+
+    class Meta:
+        model = TalkSubmission
+        fields = ["title", "abstract"]
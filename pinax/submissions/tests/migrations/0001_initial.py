@@ -0,0 +1,25 @@
+# Generated by Django 3.0.14 on 2026-10-18 07:20
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('submissions', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TalkSubmission',
+            fields=[
+                ('submissionbase_ptr', models.OneToOneField(auto_created=True, on_delete=django.db.models.deletion.CASCADE, parent_link=True, primary_key=True, serialize=False, to='submissions.SubmissionBase')),
+                ('title', models.CharField(max_length=100)),
+                ('abstract', models.TextField(blank=True)),
+            ],
+            bases=('submissions.submissionbase',),
+        ),
+    ]
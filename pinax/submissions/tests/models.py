@@ -0,0 +1,9 @@
+from django.db import models
+
+from ..models import SubmissionBase
+
+
+class TalkSubmission(SubmissionBase):
+
+    title = models.CharField(max_length=100)
+    abstract = models.TextField(blank=True)
@@ -0,0 +1,222 @@
+"""
+Query-count and latency benchmarks for the views in ``urls.py``.
+
+Each view is requested against a small and a large synthetic data set and
+fails if its query count grows with the amount of data. Set
+``PINAX_SUBMISSIONS_BENCHMARK_SCALE`` to change the number of submissions
+in the small data set (the large one is three times bigger) and
+``PINAX_SUBMISSIONS_BENCHMARK_REPORT`` to a path to write a JSON report::
+
+    $ PINAX_SUBMISSIONS_BENCHMARK_SCALE=100 \
+      PINAX_SUBMISSIONS_BENCHMARK_REPORT=bench.json \
+      python runtests.py pinax.submissions.tests.test_benchmarks
+"""
+import json
+import os
+import shutil
+import tempfile
+import time
+import tracemalloc
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import Group
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from .. import urls
+from ..models import (
+    NotificationTemplate,
+    Review,
+    ReviewAssignment,
+    SubmissionBase,
+    SubmissionKind,
+    SubmissionMessage,
+    SupportingDocument,
+)
+from .models import TalkSubmission
+
+SCALE = int(os.environ.get("PINAX_SUBMISSIONS_BENCHMARK_SCALE", 10))
+REPORT = os.environ.get("PINAX_SUBMISSIONS_BENCHMARK_REPORT")
+
+
+class DataSet:
+    """
+    Seeds submissions with reviewers, reviews, messages and documents,
+    growing in place each time ``grow`` is called.
+    """
+
+    reviewers_per_submission = 3
+
+    def __init__(self):
+        self.kind = SubmissionKind.objects.create(name="Talk", slug="talk")
+        self.group = Group.objects.create(name="reviewers")
+        self.user = get_user_model().objects.create_superuser("chair", "chair@example.com", "password")
+        self.user.groups.add(self.group)
+        self.submissions = []
+        self.reviewers = []
+
+    def grow(self, count):
+        User = get_user_model()
+        offset = len(self.submissions)
+        for i in range(offset, offset + count):
+            submitter = User.objects.create_user(f"submitter{i}", f"submitter{i}@example.com")
+            reviewer = User.objects.create_user(f"reviewer{i}", f"reviewer{i}@example.com")
+            reviewer.groups.add(self.group)
+            self.reviewers.append(reviewer)
+            self.submissions.append(TalkSubmission.objects.create(
+                kind=self.kind,
+                submitter=submitter,
+                title=f"Talk {i}",
+                abstract="An abstract",
+            ))
+        # the chair's own submission, for the submitter-facing views
+        if not offset:
+            self.own = TalkSubmission.objects.create(kind=self.kind, submitter=self.user, title="Own talk")
+            self.submissions.append(self.own)
+
+        reviews, messages, documents, assignments = [], [], [], []
+        for submission in self.submissions[offset:]:
+            for reviewer in self.reviewers[-self.reviewers_per_submission:] + [self.user]:
+                reviews.append(Review(submission=submission, user=reviewer, comment="Good", comment_html="<p>Good</p>"))
+                messages.append(SubmissionMessage(submission=submission, user=reviewer, message="Why?", message_html="<p>Why?</p>"))
+                assignments.append(ReviewAssignment(submission=submission, user=reviewer, origin=ReviewAssignment.AUTO_ASSIGNED_INITIAL))
+            documents.append(SupportingDocument(
+                submission=submission,
+                uploaded_by=submission.submitter,
+                document="document/slides.pdf",
+                description="Slides",
+            ))
+        Review.objects.bulk_create(reviews)
+        SubmissionMessage.objects.bulk_create(messages)
+        SupportingDocument.objects.bulk_create(documents)
+        ReviewAssignment.objects.bulk_create(assignments)
+        SubmissionBase.objects.filter(pk__in=[s.pk for s in self.submissions[offset:]]).update_result("accept")
+
+
+class ViewBenchmarks(TestCase):
+
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        os.mkdir(os.path.join(media_root, "document"))
+        for name in ("slides.pdf", "handout.pdf"):
+            with open(os.path.join(media_root, "document", name), "wb") as fp:
+                fp.write(b"%PDF-1.4")
+        settings = override_settings(MEDIA_ROOT=media_root)
+        settings.enable()
+        self.addCleanup(settings.disable)
+
+        self.data = DataSet()
+        self.template = NotificationTemplate.objects.create(
+            label="Accepted",
+            from_address="chair@example.com",
+            subject="Accepted",
+            body="Your talk was accepted",
+        )
+        self.client.force_login(self.data.user)
+
+    def views(self):
+        """
+        A ``(name, method, url, data, status)`` request per named URL. The
+        objects the requests delete or change are created afresh each time.
+        """
+        data = self.data
+        own = data.own.pk
+        all_pks = [str(s.pk) for s in data.submissions]
+        document = SupportingDocument.objects.create(
+            submission=data.own,
+            uploaded_by=data.user,
+            document="document/handout.pdf",
+            description="Handout",
+        )
+        review = Review.objects.create(submission=data.own, user=data.user, comment="Good")
+        assignment = ReviewAssignment.objects.create(submission=data.own, user=data.user, origin=ReviewAssignment.OPT_IN)
+        return [
+            ("submission_submit", "get", reverse("pinax_submissions:submission_submit"), {}, 200),
+            ("submission_submit_kind", "get", reverse("pinax_submissions:submission_submit_kind", args=["talk"]), {}, 200),
+            ("submission_detail", "get", reverse("pinax_submissions:submission_detail", args=[own]), {}, 200),
+            ("submission_edit", "get", reverse("pinax_submissions:submission_edit", args=[own]), {}, 200),
+            ("submission_cancel", "get", reverse("pinax_submissions:submission_cancel", args=[own]), {}, 200),
+            ("submission_document_create", "get", reverse("pinax_submissions:submission_document_create", args=[own]), {}, 200),
+            ("submission_document_archive", "get", reverse("pinax_submissions:submission_document_archive"), {}, 200),
+            ("submission_document_download", "get", document.download_url(), {}, 200),
+            ("submission_document_delete", "post", reverse("pinax_submissions:submission_document_delete", args=[document.pk]), {}, 302),
+            ("review_section", "get", reverse("pinax_submissions:review_section"), {}, 200),
+            ("user_reviewed", "get", reverse("pinax_submissions:user_reviewed"), {}, 200),
+            ("user_not_reviewed", "get", reverse("pinax_submissions:user_not_reviewed"), {}, 200),
+            ("review_section_assignments", "get", reverse("pinax_submissions:review_section_assignments"), {}, 200),
+            ("review_next", "get", reverse("pinax_submissions:review_next"), {}, 302),
+            ("submission_search", "get", reverse("pinax_submissions:submission_search"), {"q": "talk"}, 200),
+            ("review_list_user", "get", reverse("pinax_submissions:review_list_user", args=[data.user.pk]), {}, 200),
+            ("review_admin", "get", reverse("pinax_submissions:review_admin"), {}, 200),
+            ("review_bulk_result", "post", reverse("pinax_submissions:review_bulk_result"), {
+                "_selected_action": all_pks,
+                "result": "accept",
+            }, 302),
+            ("submission_export", "get", reverse("pinax_submissions:submission_export", args=["csv"]), {}, 200),
+            ("result_notification", "get", reverse("pinax_submissions:result_notification", args=["accepted"]), {}, 200),
+            ("result_notification_prepare", "post", reverse("pinax_submissions:result_notification_prepare", args=["accepted"]), {
+                "_selected_action": all_pks,
+                "notification_template": self.template.pk,
+            }, 200),
+            ("result_notification_send", "post", reverse("pinax_submissions:result_notification_send", args=["accepted"]), {
+                "submission_pks": ",".join(all_pks),
+                "notification_template": self.template.pk,
+                "from_address": "chair@example.com",
+                "subject": "Accepted",
+                "body": "Your talk was accepted",
+            }, 302),
+            ("result_notification_progress", "get", reverse("pinax_submissions:result_notification_progress", args=["batch"]), {}, 200),
+            ("review_detail", "get", reverse("pinax_submissions:review_detail", args=[own]), {}, 200),
+            ("review_delete", "post", reverse("pinax_submissions:review_delete", args=[review.pk]), {}, 302),
+            ("review_assignments", "get", reverse("pinax_submissions:review_assignments"), {}, 200),
+            ("review_assignment_opt_out", "post", reverse("pinax_submissions:review_assignment_opt_out", args=[assignment.pk]), {}, 302),
+        ]
+
+    def measure(self, method, url, data, status):
+        tracemalloc.start()
+        start = time.perf_counter()
+        with CaptureQueriesContext(connection) as queries:
+            response = getattr(self.client, method)(url, data)
+            if response.streaming:
+                b"".join(response.streaming_content)
+        elapsed = time.perf_counter() - start
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        self.assertEqual(response.status_code, status, url)
+        return {
+            "queries": len(queries),
+            "seconds": round(elapsed, 4),
+            "peak_memory": peak,
+        }
+
+    def run_views(self):
+        return {
+            name: self.measure(method, url, data, status)
+            for name, method, url, data, status in self.views()
+        }
+
+    def test_every_named_url_is_benchmarked(self):
+        self.data.grow(1)
+        names = {pattern.name for pattern in urls.urlpatterns}
+        self.assertEqual({view[0] for view in self.views()}, names)
+
+    def test_query_counts_do_not_grow_with_data(self):
+        self.data.grow(SCALE)
+        small = self.run_views()
+        self.data.grow(SCALE * 2)
+        large = self.run_views()
+
+        report = {
+            "scale": {"small": SCALE, "large": SCALE * 3},
+            "views": {name: {"small": small[name], "large": large[name]} for name in small},
+        }
+        if REPORT:
+            with open(REPORT, "w") as fp:
+                json.dump(report, fp, indent=2, sort_keys=True)
+
+        for name in small:
+            with self.subTest(view=name):
+                self.assertLessEqual(large[name]["queries"], small[name]["queries"])
@@ -1,7 +1,1458 @@
-from django.test import TestCase
+import csv
+import functools
+import importlib
+import json
+import shutil
+import tempfile
+import zipfile
+from io import BytesIO, StringIO
+from unittest import mock
+
+from django.apps import apps
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import Group, Permission
+from django.contrib.contenttypes.models import ContentType
+from django.contrib.messages import get_messages
+from django.core import checks, mail
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.management import call_command
+from django.http import QueryDict
+from django.test import RequestFactory, TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from ..assignment import AssignmentState, BalancedAssignmentStrategy
+from ..documents import (
+    FileResponseBackend,
+    XAccelRedirectBackend,
+    XSendfileBackend,
+    stream_archive,
+)
+from ..export import export_rows
+from ..facets import FacetedSearch
+from ..hooks import DefaultHookSet, hookset
+from ..models import (
+    QueuedEmail,
+    ResultNotification,
+    Review,
+    ReviewAssignment,
+    ReviewerStats,
+    SearchDocument,
+    SubmissionBase,
+    SubmissionKind,
+    SubmissionMessage,
+    SubmissionResult,
+    SubmissionResultLog,
+    SupportingDocument,
+)
+from ..pagination import InvalidCursor, KeysetPaginator
+from ..permissions import Capabilities
+from ..search import (
+    PythonBackend,
+    SQLiteBackend,
+    get_backend,
+    search_submissions,
+)
+from ..utils import submissions_generator
+from .models import TalkSubmission
 
 
 class Tests(TestCase):
 
     def setUp(self):
+        cache.clear()
+        # a TestCase never commits, so run on_commit callbacks right away
+        on_commit = mock.patch("django.db.transaction.on_commit", lambda func, using=None: func())
+        on_commit.start()
+        self.addCleanup(on_commit.stop)
+        self.kind = SubmissionKind.objects.create(name="Talk", slug="talk")
+        self.submitter = get_user_model().objects.create_user("submitter")
+        self.reviewers = Group.objects.create(name="reviewers")
+
+    def create_reviewers(self, count):
+        users = []
+        for i in range(count):
+            user = get_user_model().objects.create_user(f"reviewer{i}")
+            user.groups.add(self.reviewers)
+            users.append(user)
+        return users
+
+    def create_submissions(self, count, **kwargs):
+        kwargs.setdefault("submitter", self.submitter)
+        return [
+            TalkSubmission.objects.create(kind=self.kind, title=f"Talk {i}", **kwargs)
+            for i in range(count)
+        ]
+
+
+class SystemCheckTests(TestCase):
+
+    def test_no_errors(self):
+        # runtests.py installs django.contrib.admin, so this covers admin.py
+        errors = [
+            message for message in checks.run_checks()
+            if message.level >= checks.ERROR
+        ]
+        self.assertEqual(errors, [])
+
+
+class BulkAssignmentTests(Tests):
+
+    def test_assignments_are_balanced(self):
+        self.create_reviewers(6)
+        self.create_submissions(4)
+        ReviewAssignment.create_bulk_assignments(SubmissionBase.objects.all())
+        for submission in SubmissionBase.objects.all():
+            self.assertEqual(
+                ReviewAssignment.objects.filter(submission=submission).count(),
+                ReviewAssignment.NUM_REVIEWERS
+            )
+        loads = [
+            ReviewAssignment.objects.filter(user=user).count()
+            for user in get_user_model().objects.filter(groups=self.reviewers)
+        ]
+        self.assertEqual(loads, [2] * 6)
+
+    def test_existing_assignments_and_opt_outs_are_respected(self):
+        first, second, third, fourth = self.create_reviewers(4)
+        submission, = self.create_submissions(1)
+        ReviewAssignment.objects.create(submission=submission, user=first, origin=ReviewAssignment.OPT_IN)
+        ReviewAssignment.objects.create(
+            submission=submission,
+            user=second,
+            origin=ReviewAssignment.AUTO_ASSIGNED_INITIAL,
+            opted_out=True
+        )
+        assignments = ReviewAssignment.create_bulk_assignments([submission])
+        self.assertEqual({a.user_id for a in assignments}, {third.pk, fourth.pk})
+
+    def test_load_from_other_kinds_is_counted(self):
+        busy, *others = self.create_reviewers(4)
+        tutorials = SubmissionKind.objects.create(name="Tutorial", slug="tutorial")
+        for talk in self.create_submissions(2):
+            ReviewAssignment.objects.create(submission=talk, user=busy, origin=ReviewAssignment.OPT_IN)
+        tutorial = TalkSubmission.objects.create(kind=tutorials, title="Tutorial", submitter=self.submitter)
+        ReviewAssignment.create_assignments(tutorial)
+        self.assertEqual(
+            set(ReviewAssignment.objects.filter(submission=tutorial).values_list("user", flat=True)),
+            {user.pk for user in others}
+        )
+
+    def test_query_count_is_independent_of_submission_count(self):
+        self.create_reviewers(5)
+        submissions = self.create_submissions(20)
+        with self.assertNumQueries(12):
+            ReviewAssignment.create_bulk_assignments(submissions)
+
+    def test_submitter_is_not_assigned_own_submission(self):
+        reviewers = self.create_reviewers(3)
+        submission, = self.create_submissions(1, submitter=reviewers[0])
+        ReviewAssignment.create_assignments(submission)
+        self.assertEqual(
+            set(ReviewAssignment.objects.values_list("user", flat=True)),
+            {reviewers[1].pk, reviewers[2].pk}
+        )
+
+    def test_kind_reviewer_pool(self):
+        self.create_reviewers(3)
+        tutorial = SubmissionKind.objects.create(name="Tutorial", slug="tutorial")
+        experts = Group.objects.create(name="reviewers-tutorial")
+        expert = get_user_model().objects.create_user("expert")
+        expert.groups.add(experts)
+        submission = TalkSubmission.objects.create(kind=tutorial, submitter=self.submitter, title="Tutorial")
+        ReviewAssignment.create_assignments(submission)
+        self.assertEqual(list(ReviewAssignment.objects.values_list("user", flat=True)), [expert.pk])
+
+    def test_weighted_strategy(self):
+        strategy = BalancedAssignmentStrategy(
+            num_reviewers=1,
+            weight=lambda kind_id, user_id: 3 if user_id == 1 else 1,
+        )
+        submissions = self.create_submissions(8)
+        pairs = strategy.assign(submissions, {self.kind.pk: [1, 2]}, AssignmentState.from_loads([], []))
+        self.assertEqual(sorted(user_id for _, user_id in pairs), [1] * 6 + [2] * 2)
+
+    def test_dry_run_does_not_save(self):
+        self.create_reviewers(3)
+        self.create_submissions(2)
+        out = StringIO()
+        call_command("assign_reviewers", dry_run=True, stdout=out)
+        self.assertIn("Would create 6 assignments for 2 submissions", out.getvalue())
+        self.assertFalse(ReviewAssignment.objects.exists())
+
+
+class ReassignmentTests(Tests):
+
+    def assign(self, reviewers, submissions):
+        ReviewAssignment.create_bulk_assignments(submissions)
+        return ReviewAssignment.objects.select_related("submission__kind").filter(
+            submission=submissions[0]
+        ).first()
+
+    def stats(self):
+        return dict(ReviewerStats.objects.values_list("user", "assignment_count"))
+
+    def test_bulk_assignment_refreshes_stats(self):
+        reviewers = self.create_reviewers(4)
+        self.create_submissions(4)
+        ReviewAssignment.create_bulk_assignments(SubmissionBase.objects.all())
+        self.assertEqual(self.stats(), {reviewer.pk: 3 for reviewer in reviewers})
+
+    def test_opt_out_assigns_least_loaded_reviewer(self):
+        reviewers = self.create_reviewers(4)
+        submissions = self.create_submissions(2)
+        assignment = self.assign(reviewers, submissions)
+        stats = self.stats()
+        assigned = set(
+            ReviewAssignment.objects.filter(submission=submissions[0]).values_list("user", flat=True)
+        )
+        free, = {reviewer.pk for reviewer in reviewers} - assigned
+
+        replacement = assignment.opt_out()
+
+        self.assertEqual(replacement.user_id, free)
+        self.assertEqual(replacement.origin, ReviewAssignment.AUTO_ASSIGNED_LATER)
+        self.assertTrue(ReviewAssignment.objects.get(pk=assignment.pk).opted_out)
+        stats[assignment.user_id] -= 1
+        stats[free] += 1
+        self.assertEqual(self.stats(), stats)
+
+    def test_opt_out_twice_is_a_no_op(self):
+        reviewers = self.create_reviewers(4)
+        assignment = self.assign(reviewers, self.create_submissions(1))
+        assignment.opt_out()
+        self.assertIsNone(assignment.opt_out())
+        self.assertEqual(ReviewAssignment.objects.count(), 4)
+
+    def test_opt_out_skips_submitter(self):
+        reviewers = self.create_reviewers(3)
+        submission, = self.create_submissions(1)
+        assignment = self.assign(reviewers, [submission])
+        self.submitter.groups.add(self.reviewers)
+        ReviewerStats.objects.refresh([self.submitter.pk])
+        self.assertIsNone(assignment.opt_out())
+
+    def test_opt_out_without_stats_falls_back_to_strategy(self):
+        reviewers = self.create_reviewers(4)
+        submission, = self.create_submissions(1)
+        for reviewer in reviewers[:3]:
+            ReviewAssignment.objects.create(submission=submission, user=reviewer, origin=ReviewAssignment.OPT_IN)
+        replacement = ReviewAssignment.objects.filter(submission=submission).first().opt_out()
+        self.assertEqual(replacement.user, reviewers[3])
+
+    def test_query_count_is_independent_of_pool_size(self):
+        reviewers = self.create_reviewers(4)
+        assignment = self.assign(reviewers, self.create_submissions(1))
+        with self.assertNumQueries(11):
+            assignment.opt_out()
+
+        for i in range(30):
+            get_user_model().objects.create_user(f"extra{i}").groups.add(self.reviewers)
+        ReviewerStats.objects.refresh(get_user_model().objects.values_list("pk", flat=True))
+        assignment = ReviewAssignment.objects.select_related("submission__kind").filter(opted_out=False).first()
+        with self.assertNumQueries(11):
+            assignment.opt_out()
+
+    def test_opt_out_view(self):
+        reviewers = self.create_reviewers(4)
+        assignment = self.assign(reviewers, self.create_submissions(1))
+        self.client.force_login(assignment.user)
+        response = self.client.post(
+            reverse("pinax_submissions:review_assignment_opt_out", args=[assignment.pk])
+        )
+        self.assertRedirects(response, reverse("pinax_submissions:review_assignments"), fetch_redirect_response=False)
+        self.assertEqual(ReviewAssignment.objects.filter(opted_out=False).count(), ReviewAssignment.NUM_REVIEWERS)
+
+
+class ReviewerCacheTests(Tests):
+
+    def setUp(self):
+        super().setUp()
+        self.perm = Permission.objects.get(content_type__app_label="submissions", codename="add_review")
+        self.reviewers.permissions.add(self.perm)
+
+    def test_reviewers_are_cached(self):
+        reviewers = self.create_reviewers(3)
+        self.assertEqual(set(hookset.reviewers()), set(reviewers))
+        with self.assertNumQueries(1):
+            self.assertEqual(set(hookset.reviewers()), set(reviewers))
+
+    def test_group_membership_invalidates(self):
+        first, second = self.create_reviewers(2)
+        self.assertEqual(set(hookset.reviewers()), {first, second})
+        second.groups.remove(self.reviewers)
+        self.submitter.user_permissions.add(self.perm)
+        self.assertEqual(set(hookset.reviewers()), {first, self.submitter})
+
+    def test_group_permissions_invalidate(self):
+        self.create_reviewers(2)
+        self.assertEqual(hookset.reviewers().count(), 2)
+        self.reviewers.permissions.clear()
+        self.assertEqual(hookset.reviewers().count(), 0)
+
+    def test_user_permissions_are_cached(self):
+        reviewer, = self.create_reviewers(1)
+        self.assertIn("submissions.add_review", hookset.user_permissions(reviewer))
+        reviewer = get_user_model().objects.get(pk=reviewer.pk)
+        with self.assertNumQueries(0):
+            self.assertIn("submissions.add_review", hookset.user_permissions(reviewer))
+        reviewer.groups.remove(self.reviewers)
+        reviewer = get_user_model().objects.get(pk=reviewer.pk)
+        self.assertNotIn("submissions.add_review", hookset.user_permissions(reviewer))
+
+    def test_review_admin_counts(self):
+        first, second = self.create_reviewers(2)
+        submission, = self.create_submissions(1)
+        ReviewAssignment.objects.create(submission=submission, user=first, origin=ReviewAssignment.OPT_IN)
+        ReviewAssignment.objects.create(submission=submission, user=second, origin=ReviewAssignment.OPT_IN, opted_out=True)
+        Review.objects.create(submission=submission, user=first, comment="Good")
+        hookset.reviewers()
+        self.client.force_login(get_user_model().objects.create_superuser("chair", "chair@example.com", "password"))
+        with self.assertNumQueries(3):
+            response = self.client.get(reverse("pinax_submissions:review_admin"))
+        counts = {
+            reviewer: (reviewer.assignment_count, reviewer.review_count, reviewer.opt_out_count)
+            for reviewer in response.context["reviewers"]
+        }
+        self.assertEqual(counts, {first: (1, 1, 0), second: (0, 0, 1)})
+
+
+class ReviewerStatsTests(Tests):
+
+    def stats(self, user):
+        return ReviewerStats.objects.values(
+            "assignment_count", "review_count", "outstanding_count", "opt_out_count"
+        ).get(user=user)
+
+    def test_signals_update_stats(self):
+        reviewer, = self.create_reviewers(1)
+        first, second = self.create_submissions(2)
+        now = timezone.now()
+        ReviewAssignment.objects.create(
+            submission=first,
+            user=reviewer,
+            origin=ReviewAssignment.OPT_IN,
+            assigned_at=now - timezone.timedelta(hours=4),
+        )
+        assignment = ReviewAssignment.objects.create(submission=second, user=reviewer, origin=ReviewAssignment.OPT_IN)
+        self.assertEqual(
+            self.stats(reviewer),
+            {"assignment_count": 2, "review_count": 0, "outstanding_count": 2, "opt_out_count": 0}
+        )
+
+        review = Review.objects.create(submission=first, user=reviewer, comment="Good", submitted_at=now)
+        assignment.opted_out = True
+        assignment.save()
+        self.assertEqual(
+            self.stats(reviewer),
+            {"assignment_count": 1, "review_count": 1, "outstanding_count": 0, "opt_out_count": 1}
+        )
+        self.assertEqual(reviewer.reviewer_stats.average_turnaround, timezone.timedelta(hours=4))
+
+        review.delete()
+        self.assertEqual(self.stats(reviewer)["outstanding_count"], 1)
+
+    def test_deleting_a_reviewer(self):
+        reviewer, = self.create_reviewers(1)
+        submission, = self.create_submissions(1)
+        ReviewAssignment.objects.create(submission=submission, user=reviewer, origin=ReviewAssignment.OPT_IN)
+        Review.objects.create(submission=submission, user=reviewer, comment="Good")
+        reviewer.delete()
+        self.assertFalse(ReviewerStats.objects.exists())
+
+    def test_incremental_updates_match_rebuild(self):
+        first, second = self.create_reviewers(2)
+        submissions = self.create_submissions(3)
+        now = timezone.now()
+        # reviewed before being assigned, then assigned earlier still
+        Review.objects.create(submission=submissions[0], user=first, comment="Good", submitted_at=now)
+        ReviewAssignment.objects.create(
+            submission=submissions[0],
+            user=first,
+            origin=ReviewAssignment.OPT_IN,
+            assigned_at=now - timezone.timedelta(hours=2),
+        )
+        for submission in submissions[1:]:
+            for reviewer in (first, second):
+                ReviewAssignment.objects.create(
+                    submission=submission,
+                    user=reviewer,
+                    origin=ReviewAssignment.OPT_IN,
+                    assigned_at=now - timezone.timedelta(hours=6),
+                )
+        Review.objects.create(submission=submissions[1], user=second, comment="Good", submitted_at=now)
+        hookset.reassign(ReviewAssignment, ReviewAssignment.objects.get(submission=submissions[2], user=first))
+        submissions[1].delete()
+
+        fields = ReviewerStats.COUNTERS
+        incremental = list(ReviewerStats.objects.order_by("user").values(*fields))
+        ReviewerStats.objects.refresh()
+        self.assertEqual(incremental, list(ReviewerStats.objects.order_by("user").values(*fields)))
+        self.assertEqual(first.reviewer_stats.average_turnaround, timezone.timedelta(hours=2))
+
+    def test_rebuild_command(self):
+        reviewers = self.create_reviewers(3)
+        submissions = self.create_submissions(3)
+        ReviewAssignment.objects.bulk_create([
+            ReviewAssignment(submission=submission, user=reviewer, origin=ReviewAssignment.OPT_IN)
+            for submission in submissions
+            for reviewer in reviewers
+        ])
+        Review.objects.bulk_create([
+            Review(submission=submission, user=reviewers[0], comment="Good")
+            for submission in submissions
+        ])
+        ReviewerStats.objects.create(user=self.submitter, assignment_count=5)
+        out = StringIO()
+        call_command("rebuild_reviewer_stats", stdout=out)
+        self.assertIn("Rebuilt stats for 4 reviewers", out.getvalue())
+        self.assertEqual(
+            self.stats(reviewers[0]),
+            {"assignment_count": 3, "review_count": 3, "outstanding_count": 0, "opt_out_count": 0}
+        )
+        self.assertEqual(self.stats(reviewers[1])["outstanding_count"], 3)
+        self.assertEqual(self.stats(self.submitter)["assignment_count"], 0)
+
+
+class SubmissionResultTests(Tests):
+
+    def test_result_is_created_with_submission(self):
+        submission, = self.create_submissions(1)
+        self.assertEqual(SubmissionBase.objects.get(pk=submission.pk).result.status, "undecided")
+
+    def test_create_missing(self):
+        self.create_submissions(3)
+        SubmissionResult.objects.all().delete()
+        SubmissionResult.objects.create_missing(SubmissionBase.objects.all())
+        self.assertEqual(SubmissionResult.objects.count(), 3)
+
+    def test_generator_query_count_is_independent_of_submission_count(self):
+        submissions = self.create_submissions(10)
+        SubmissionResult.objects.filter(submission__in=submissions[:5]).delete()
+        queryset = SubmissionBase.objects.select_subclasses()
+        with self.assertNumQueries(2):
+            statuses = [
+                (submission.title, submission.result.status)
+                for submission in submissions_generator(None, queryset)
+            ]
+        self.assertEqual(len(statuses), 10)
+
+
+class ReviewStatsTests(Tests):
+
+    def test_with_review_stats(self):
+        first, second = self.create_reviewers(2)
+        reviewed, unreviewed = self.create_submissions(2)
+        Review.objects.create(submission=reviewed, user=first, comment="Good")
+        Review.objects.create(submission=reviewed, user=second, comment="Bad")
+        SubmissionMessage.objects.create(submission=reviewed, user=first, message="Why?")
+
+        submissions = SubmissionBase.objects.with_review_stats(first).select_subclasses().order_by("pk")
+        with self.assertNumQueries(1):
+            stats = [
+                (s.title, s.review_count, s.message_count, s.reviewed_by_me, s.last_review_at is None)
+                for s in submissions
+            ]
+        self.assertEqual(stats, [
+            ("Talk 0", 2, 1, True, False),
+            ("Talk 1", 0, 0, False, True),
+        ])
+        self.assertEqual(reviewed.result.comment_count, 2)
+
+
+class KeysetPaginatorTests(Tests):
+
+    def test_pages(self):
+        submissions = self.create_submissions(5)
+        # ties on submitted are broken by pk
+        SubmissionBase.objects.filter(pk__in=[s.pk for s in submissions[1:3]]).update(
+            submitted=submissions[1].submitted
+        )
+        paginator = KeysetPaginator(SubmissionBase.objects.select_subclasses(), 2)
+
+        first = paginator.page()
+        self.assertEqual([s.title for s in first], ["Talk 0", "Talk 1"])
+        self.assertFalse(first.has_previous())
+        second = paginator.page(after=first.next_cursor)
+        self.assertEqual([s.title for s in second], ["Talk 2", "Talk 3"])
+        last = paginator.page(after=second.next_cursor)
+        self.assertEqual([s.title for s in last], ["Talk 4"])
+        self.assertFalse(last.has_next())
+
+        previous = paginator.page(before=last.previous_cursor)
+        self.assertEqual([s.title for s in previous], ["Talk 2", "Talk 3"])
+        self.assertTrue(previous.has_previous())
+
+    def test_invalid_cursor(self):
+        paginator = KeysetPaginator(SubmissionBase.objects.all(), 2)
+        with self.assertRaises(InvalidCursor):
+            paginator.page(after="not-a-cursor")
+
+
+class BrokenConnection:
+
+    def open(self):
+        pass
+
+    def close(self):
         pass
+
+    def send_messages(self, messages):
+        raise OSError("Connection refused")
+
+
+class UnreachableConnection(BrokenConnection):
+
+    def open(self):
+        raise OSError("Connection refused")
+
+
+class QueuedEmailTests(TestCase):
+
+    def enqueue(self, count):
+        messages = [
+            mail.EmailMessage(f"Subject {i}", "Body", "from@example.com", [f"to{i}@example.com"])
+            for i in range(count)
+        ]
+        with self.assertNumQueries(1):
+            return QueuedEmail.objects.enqueue(messages)
+
+    def test_send_queued(self):
+        self.enqueue(3)
+        self.assertEqual(QueuedEmail.objects.send_queued(batch_size=2), (2, 0))
+        self.assertEqual(QueuedEmail.objects.send_queued(batch_size=2), (1, 0))
+        self.assertEqual(QueuedEmail.objects.send_queued(batch_size=2), (0, 0))
+        self.assertEqual([m.to for m in mail.outbox], [["to0@example.com"], ["to1@example.com"], ["to2@example.com"]])
+        self.assertFalse(QueuedEmail.objects.exclude(status=QueuedEmail.STATUS_SENT).exists())
+
+    def test_failed_emails_are_retried_with_backoff(self):
+        self.enqueue(1)
+        self.assertEqual(QueuedEmail.objects.send_queued(connection=BrokenConnection()), (0, 1))
+        email = QueuedEmail.objects.get()
+        self.assertEqual(email.status, QueuedEmail.STATUS_QUEUED)
+        self.assertEqual(email.attempts, 1)
+        self.assertGreater(email.next_attempt_at, timezone.now())
+        self.assertEqual(QueuedEmail.objects.send_queued(), (0, 0))
+
+        with self.settings(PINAX_SUBMISSIONS_EMAIL_MAX_ATTEMPTS=2):
+            QueuedEmail.objects.update(next_attempt_at=timezone.now())
+            QueuedEmail.objects.send_queued(connection=BrokenConnection())
+        self.assertEqual(QueuedEmail.objects.get().status, QueuedEmail.STATUS_FAILED)
+
+    def test_connection_failure_is_recorded(self):
+        self.enqueue(2)
+        self.assertEqual(QueuedEmail.objects.send_queued(connection=UnreachableConnection()), (0, 2))
+        for email in QueuedEmail.objects.all():
+            self.assertEqual(email.status, QueuedEmail.STATUS_QUEUED)
+            self.assertEqual(email.attempts, 1)
+            self.assertEqual(email.last_error, "Connection refused")
+            self.assertGreater(email.next_attempt_at, timezone.now())
+
+    def test_claimed_emails_are_skipped(self):
+        self.enqueue(3)
+        claimed = QueuedEmail.objects.claim(2)
+        self.assertEqual(len(claimed), 2)
+        self.assertEqual(QueuedEmail.objects.send_queued(), (1, 0))
+        self.assertEqual(QueuedEmail.objects.send_queued(), (0, 0))
+
+    def test_command(self):
+        self.enqueue(2)
+        out = StringIO()
+        call_command("send_queued_email", stdout=out)
+        self.assertIn("Sent 2 emails, 0 failed", out.getvalue())
+        self.assertEqual(len(mail.outbox), 2)
+
+
+class SendEmailsTests(Tests):
+
+    @override_settings(PINAX_SUBMISSIONS_EMAIL_QUEUE=True)
+    def test_send_emails_queues_one_row_per_recipient(self):
+        submission, = self.create_submissions(1)
+        recipients = [([f"user{i}@example.com"], {"submission": submission, "user": self.submitter}) for i in range(3)]
+        hookset.send_emails(recipients, "submission_updated")
+        emails = list(QueuedEmail.objects.order_by("pk"))
+        self.assertEqual([e.to for e in emails], [f"user{i}@example.com" for i in range(3)])
+        self.assertEqual(emails[0].subject, "[example.com] Talk 0 was updated")
+        self.assertEqual(emails[0].body, "submitter updated Talk 0.\n")
+
+    def test_plaintext_template(self):
+        submission, = self.create_submissions(1)
+        message = SubmissionMessage.objects.create(submission=submission, user=self.submitter, message="*Hi*")
+        with self.settings(PINAX_SUBMISSIONS_EMAIL_QUEUE=False):
+            hookset.send_emails([(["a@example.com"], {"submission": submission, "message": message})], "submission_new_message")
+        self.assertEqual(mail.outbox[0].body, "*Hi*\n")
+        self.assertIn("<em>Hi</em>", mail.outbox[0].alternatives[0][0])
+
+
+class ResultNotificationTests(Tests):
+
+    @override_settings(PINAX_SUBMISSIONS_EMAIL_QUEUE=True)
+    def test_send_in_chunks(self):
+        self.create_submissions(5, submitter=get_user_model().objects.create_user("a", "a@example.com"))
+        submissions = SubmissionBase.objects.select_related("submitter", "kind").select_subclasses()
+        with self.settings(PINAX_SUBMISSIONS_NOTIFICATION_CHUNK_SIZE=2):
+            count = ResultNotification.objects.send(
+                submissions,
+                template=None,
+                from_address="chair@example.com",
+                subject="Your submission",
+                body="Your {{ submission.kind }} was accepted",
+                batch="abc",
+            )
+        self.assertEqual(count, 5)
+        self.assertEqual(
+            set(ResultNotification.objects.values_list("body", flat=True)),
+            {"Your Talk was accepted"}
+        )
+        self.assertEqual(QueuedEmail.objects.progress("abc"), {"queued": 5, "sent": 0, "failed": 0, "total": 5})
+        QueuedEmail.objects.send_queued()
+        self.assertEqual(QueuedEmail.objects.progress("abc")["sent"], 5)
+        self.assertEqual(mail.outbox[0].to, ["a@example.com"])
+
+        self.client.force_login(get_user_model().objects.create_superuser("chair", "chair@example.com", "password"))
+        response = self.client.get(reverse("pinax_submissions:result_notification_progress", args=["abc"]))
+        self.assertEqual(response.json(), {"queued": 0, "sent": 5, "failed": 0, "total": 5})
+
+    def send_view(self):
+        submissions = self.create_submissions(2, submitter=get_user_model().objects.create_user("a", "a@example.com"))
+        for submission in submissions:
+            submission.accept()
+        self.client.force_login(get_user_model().objects.create_superuser("chair", "chair@example.com", "password"))
+        return self.client.post(reverse("pinax_submissions:result_notification_send", args=["accepted"]), {
+            "submission_pks": ",".join(str(submission.pk) for submission in submissions),
+            "from_address": "chair@example.com",
+            "subject": "Accepted",
+            "body": "Your talk was accepted",
+        })
+
+    def test_send_view_without_queue_reports_delivery(self):
+        response = self.send_view()
+        self.assertRedirects(
+            response,
+            reverse("pinax_submissions:result_notification", args=["accepted"]),
+            fetch_redirect_response=False
+        )
+        self.assertEqual(len(mail.outbox), 2)
+        self.assertEqual([str(m) for m in get_messages(response.wsgi_request)], ["2 notifications sent."])
+
+    @override_settings(PINAX_SUBMISSIONS_EMAIL_QUEUE=True)
+    def test_send_view_with_queue_links_progress(self):
+        response = self.send_view()
+        batch = response["Location"].split("?batch=")[1]
+        self.assertEqual(QueuedEmail.objects.progress(batch)["queued"], 2)
+        self.assertEqual(mail.outbox, [])
+
+    def test_send_without_queue(self):
+        self.create_submissions(3, submitter=get_user_model().objects.create_user("a", "a@example.com"))
+        with self.settings(PINAX_SUBMISSIONS_EMAIL_QUEUE=False):
+            ResultNotification.objects.send(
+                SubmissionBase.objects.select_subclasses(),
+                template=None,
+                from_address="chair@example.com",
+                subject="Your submission",
+                body="Hello",
+            )
+        self.assertEqual(len(mail.outbox), 3)
+        self.assertFalse(QueuedEmail.objects.exists())
+
+
+class BulkResultTests(Tests):
+
+    def test_update_result(self):
+        submissions = self.create_submissions(4)
+        submissions[0].update_result("accept", user=self.submitter)
+        SubmissionResult.objects.filter(submission=submissions[1]).delete()
+
+        queryset = SubmissionBase.objects.filter(pk__in=[s.pk for s in submissions[:3]])
+        self.assertEqual(queryset.update_result("accept", user=self.submitter), 2)
+
+        self.assertEqual(
+            list(SubmissionBase.objects.order_by("pk").values_list("result__status", flat=True)),
+            ["accepted", "accepted", "accepted", "undecided"]
+        )
+        self.assertEqual(
+            list(SubmissionResultLog.objects.values_list("submission", "old_status", "new_status")),
+            [
+                (submissions[0].pk, "undecided", "accepted"),
+                (submissions[1].pk, "undecided", "accepted"),
+                (submissions[2].pk, "undecided", "accepted"),
+            ]
+        )
+
+    def post(self, data):
+        return self.client.post(reverse("pinax_submissions:review_bulk_result"), data)
+
+    def statuses(self):
+        return list(SubmissionBase.objects.order_by("pk").values_list("result__status", flat=True))
+
+    def test_view_requires_manager(self):
+        submission, = self.create_submissions(1)
+        self.client.force_login(self.submitter)
+        response = self.post({"result": "accept", "_selected_action": [submission.pk]})
+        self.assertTemplateUsed(response, "pinax/submissions/access_not_permitted.html")
+        self.assertEqual(self.statuses(), ["undecided"])
+
+    def test_view_rejects_invalid_input(self):
+        submission, = self.create_submissions(1)
+        self.client.force_login(get_user_model().objects.create_superuser("chair", "chair@example.com", "password"))
+        self.assertEqual(self.post({"result": "accepted", "_selected_action": [submission.pk]}).status_code, 400)
+        self.assertEqual(self.post({"result": "accept", "_selected_action": ["first"]}).status_code, 400)
+        self.assertEqual(self.client.get(reverse("pinax_submissions:review_bulk_result")).status_code, 405)
+        self.assertEqual(self.statuses(), ["undecided"])
+
+    def test_view_updates_and_redirects(self):
+        submissions = self.create_submissions(3)
+        chair = get_user_model().objects.create_superuser("chair", "chair@example.com", "password")
+        self.client.force_login(chair)
+        response = self.post({"result": "reject", "_selected_action": [s.pk for s in submissions[:2]]})
+        self.assertRedirects(response, reverse("pinax_submissions:review_section"), fetch_redirect_response=False)
+        self.assertEqual(self.statuses(), ["rejected", "rejected", "undecided"])
+        self.assertEqual(SubmissionResultLog.objects.filter(user=chair).count(), 2)
+
+        next_url = reverse("pinax_submissions:user_not_reviewed")
+        response = self.post({"result": "accept", "_selected_action": [submissions[2].pk], "next": next_url})
+        self.assertRedirects(response, next_url, fetch_redirect_response=False)
+        response = self.post({"result": "accept", "next": "https://example.com/"})
+        self.assertRedirects(response, reverse("pinax_submissions:review_section"), fetch_redirect_response=False)
+
+
+class MarkupTests(Tests):
+
+    def test_parse_content_is_memoized(self):
+        calls = []
+
+        def renderer(content):
+            calls.append(content)
+            return content.upper()
+
+        with self.settings(PINAX_SUBMISSIONS_MARKUP_RENDERER=renderer):
+            self.assertEqual(hookset.parse_content("hello"), "HELLO")
+            self.assertEqual(hookset.parse_content("hello"), "HELLO")
+            self.assertEqual(hookset.parse_content("bye"), "BYE")
+        self.assertEqual(calls, ["hello", "bye"])
+
+    def test_renderer_name_is_stable(self):
+        self.assertEqual(hookset.renderer_name(json.dumps), "json.dumps")
+        self.assertEqual(
+            hookset.renderer_name(functools.partial(json.dumps, indent=2)),
+            "json.dumps((), [('indent', 2)])"
+        )
+        self.assertIsNone(hookset.renderer_name(functools.partial(json.dumps, default=object())))
+
+        class Renderer:
+            def __call__(self, content):
+                return content
+
+        self.assertIsNone(hookset.renderer_name(Renderer()))
+        with self.settings(PINAX_SUBMISSIONS_MARKUP_RENDERER=Renderer()):
+            self.assertEqual(hookset.parse_content("hello"), "hello")
+
+    def test_rerender_markup(self):
+        submission, = self.create_submissions(1)
+        review = Review.objects.create(submission=submission, user=self.submitter, comment="*great*")
+        self.assertEqual(review.comment_html, "<p><em>great</em></p>")
+
+        with self.settings(PINAX_SUBMISSIONS_MARKUP_RENDERER=str.upper):
+            out = StringIO()
+            call_command("rerender_markup", stdout=out)
+        self.assertIn("Re-rendered 1 reviews", out.getvalue())
+        review.refresh_from_db()
+        self.assertEqual(review.comment_html, "*GREAT*")
+
+
+class ExportTests(Tests):
+
+    def setUp(self):
+        super().setUp()
+        self.reviewer, = self.create_reviewers(1)
+        self.submissions = self.create_submissions(3, abstract="An abstract")
+        self.submissions[0].accept()
+        Review.objects.create(submission=self.submissions[0], user=self.reviewer, comment="Great")
+        Review.objects.create(submission=self.submissions[0], user=self.submitter, comment="Mine")
+
+    def test_rows(self):
+        rows = list(export_rows())
+        self.assertEqual([row["title"] for row in rows], ["Talk 0", "Talk 1", "Talk 2"])
+        self.assertEqual(rows[0]["status"], "accepted")
+        self.assertEqual(rows[0]["review_count"], 2)
+        self.assertEqual([review["comment"] for review in rows[0]["reviews"]], ["Great", "Mine"])
+        self.assertEqual(rows[1]["reviews"], [])
+
+    def test_query_count_is_independent_of_submission_count(self):
+        # one query for the submissions and one for each chunk's reviews
+        with self.assertNumQueries(3):
+            list(export_rows(chunk_size=2))
+        self.create_submissions(1)
+        with self.assertNumQueries(3):
+            list(export_rows(chunk_size=2))
+
+    def test_csv_view(self):
+        self.client.force_login(get_user_model().objects.create_superuser("chair", "chair@example.com", "password"))
+        response = self.client.get(reverse("pinax_submissions:submission_export", args=["csv"]))
+        self.assertEqual(response["Content-Type"], "text/csv")
+        rows = list(csv.DictReader(StringIO(b"".join(response.streaming_content).decode())))
+        self.assertEqual(len(rows), 3)
+        self.assertEqual(rows[0]["kind"], "Talk")
+        self.assertEqual(rows[0]["abstract"], "An abstract")
+        self.assertEqual(rows[0]["reviews"], "reviewer0: Great\n\nsubmitter: Mine")
+
+    def test_export_requires_permission(self):
+        self.client.force_login(self.reviewer)
+        response = self.client.get(reverse("pinax_submissions:submission_export", args=["csv"]))
+        self.assertTemplateUsed(response, "pinax/submissions/access_not_permitted.html")
+
+    def test_ndjson_command(self):
+        out = StringIO()
+        call_command("export_submissions", format="ndjson", stdout=out)
+        rows = [json.loads(line) for line in out.getvalue().splitlines()]
+        self.assertEqual([row["id"] for row in rows], [submission.pk for submission in self.submissions])
+        self.assertEqual(rows[0]["reviews"][0]["user"], "reviewer0")
+
+
+class SubmissionViewTests(Tests):
+
+    def setUp(self):
+        super().setUp()
+        self.submission, = self.create_submissions(1)
+        self.client.force_login(self.submitter)
+
+    def test_detail_fetches_submission_once(self):
+        url = reverse("pinax_submissions:submission_detail", args=[self.submission.pk])
+        self.client.get(url)  # warm the permissions cache
+        # session, user, submission, documents, messages
+        with self.assertNumQueries(5):
+            response = self.client.get(url)
+        self.assertIsInstance(response.context["submission"], TalkSubmission)
+
+    def test_edit_fetches_submission_once(self):
+        url = reverse("pinax_submissions:submission_edit", args=[self.submission.pk])
+        self.client.get(url)  # warm the permissions cache
+        with self.assertNumQueries(3):
+            response = self.client.get(url)
+        self.assertEqual(response.context["form"].instance.title, "Talk 0")
+
+    def test_other_users_submissions_are_not_found(self):
+        self.client.force_login(get_user_model().objects.create_user("someone"))
+        for name in ["submission_detail", "submission_edit", "submission_cancel", "submission_document_create"]:
+            with self.subTest(view=name):
+                response = self.client.get(reverse(f"pinax_submissions:{name}", args=[self.submission.pk]))
+                self.assertEqual(response.status_code, 404)
+
+    def test_editing_closed(self):
+        TalkSubmission.can_edit = lambda self: False
+        try:
+            response = self.client.get(reverse("pinax_submissions:submission_edit", args=[self.submission.pk]))
+        finally:
+            del TalkSubmission.can_edit
+        self.assertTemplateUsed(response, "pinax/submissions/submission_error.html")
+
+
+class ReviewDetailTests(Tests):
+
+    def setUp(self):
+        super().setUp()
+        self.submission, = self.create_submissions(1)
+        self.chair = get_user_model().objects.create_superuser("chair", "chair@example.com", "password")
+        self.client.force_login(self.chair)
+        self.url = reverse("pinax_submissions:review_detail", args=[self.submission.pk])
+
+    def add_activity(self, count):
+        for reviewer in self.create_reviewers(count):
+            ReviewAssignment.objects.create(submission=self.submission, user=reviewer, origin=ReviewAssignment.OPT_IN)
+            Review.objects.create(submission=self.submission, user=reviewer, comment="Good")
+            SubmissionMessage.objects.create(submission=self.submission, user=reviewer, message="Why?")
+
+    def test_query_count_is_independent_of_review_count(self):
+        self.add_activity(1)
+        with self.assertNumQueries(7):
+            response = self.client.get(self.url)
+        self.assertEqual(len(response.context["reviews"]), 1)
+
+        Review.objects.all().delete()
+        ReviewAssignment.objects.all().delete()
+        get_user_model().objects.filter(username__startswith="reviewer").delete()
+        self.add_activity(10)
+        with self.assertNumQueries(7):
+            response = self.client.get(self.url)
+        self.assertEqual(len(response.context["reviews"]), 10)
+        self.assertEqual(len(response.context["assignments"]), 10)
+        self.assertContains(response, "reviewer9: <p>Good</p>")
+
+        # the cached fragment is rendered without querying the related rows
+        with self.assertNumQueries(3):
+            response = self.client.get(self.url)
+        self.assertContains(response, "reviewer9: <p>Good</p>")
+
+    def test_invalid_message(self):
+        response = self.client.post(self.url, {"message_submit": "1"})
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.context["message_form"].errors)
+
+
+class DocumentTests(Tests):
+
+    def setUp(self):
+        super().setUp()
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root)
+        settings = override_settings(MEDIA_ROOT=self.media_root, MEDIA_URL="/media/")
+        settings.enable()
+        self.addCleanup(settings.disable)
+
+        submission, = self.create_submissions(1)
+        self.document = SupportingDocument(submission=submission, uploaded_by=self.submitter, description="Slides")
+        self.document.document.save("slides.pdf", ContentFile(b"0123456789"))
+        self.factory = RequestFactory()
+
+    def serve(self, backend=None, **headers):
+        backend = backend or FileResponseBackend()
+        response = backend.serve(self.factory.get("/", **headers), self.document)
+        if response.streaming:
+            self.addCleanup(response.close)
+        return response
+
+    def content(self, response):
+        return b"".join(response.streaming_content)
+
+    def test_full_file(self):
+        response = self.serve()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.content(response), b"0123456789")
+        self.assertEqual(response["Content-Length"], "10")
+        self.assertEqual(response["Accept-Ranges"], "bytes")
+        self.assertEqual(response["Content-Type"], "application/pdf")
+        self.assertTrue(response.has_header("ETag"))
+
+    def test_ranges(self):
+        for header, content, content_range in [
+            ("bytes=2-4", b"234", "bytes 2-4/10"),
+            ("bytes=7-", b"789", "bytes 7-9/10"),
+            ("bytes=-2", b"89", "bytes 8-9/10"),
+            ("bytes=8-20", b"89", "bytes 8-9/10"),
+        ]:
+            with self.subTest(range=header):
+                response = self.serve(HTTP_RANGE=header)
+                self.assertEqual(response.status_code, 206)
+                self.assertEqual(self.content(response), content)
+                self.assertEqual(response["Content-Length"], str(len(content)))
+                self.assertEqual(response["Content-Range"], content_range)
+
+    def test_unsatisfiable_range(self):
+        response = self.serve(HTTP_RANGE="bytes=10-")
+        self.assertEqual(response.status_code, 416)
+        self.assertEqual(response["Content-Range"], "bytes */10")
+
+    def test_multiple_ranges_serve_whole_file(self):
+        response = self.serve(HTTP_RANGE="bytes=0-1,4-5")
+        self.assertEqual(response.status_code, 200)
+
+    def test_missing_file(self):
+        document = SupportingDocument.objects.create(
+            submission=self.document.submission,
+            uploaded_by=self.submitter,
+            document="document/never-written.pdf",
+            description="Missing",
+        )
+        self.client.force_login(self.submitter)
+        with self.settings(PINAX_SUBMISSIONS_DOCUMENT_BACKEND=FileResponseBackend()):
+            response = self.client.get(document.download_url())
+        self.assertEqual(response.status_code, 404)
+
+    def test_if_range_mismatch_serves_whole_file(self):
+        response = self.serve(HTTP_RANGE="bytes=0-1", HTTP_IF_RANGE='"stale"')
+        self.assertEqual(response.status_code, 200)
+
+    def test_if_none_match(self):
+        etag = self.serve()["ETag"]
+        response = self.serve(HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+    def test_x_accel_redirect(self):
+        response = self.serve(XAccelRedirectBackend())
+        self.assertEqual(response["X-Accel-Redirect"], self.document.document.url)
+        self.assertFalse(response.has_header("Content-Type"))
+
+    def test_x_sendfile(self):
+        response = self.serve(XSendfileBackend())
+        self.assertEqual(response["X-Sendfile"], self.document.document.path)
+
+    def test_download_view(self):
+        self.client.force_login(self.submitter)
+        response = self.client.get(self.document.download_url(), HTTP_RANGE="bytes=0-3")
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(self.content(response), b"0123")
+        response.close()
+
+
+class ArchiveTests(Tests):
+
+    def setUp(self):
+        super().setUp()
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root)
+        settings = override_settings(MEDIA_ROOT=self.media_root)
+        settings.enable()
+        self.addCleanup(settings.disable)
+
+        self.reviewer, = self.create_reviewers(1)
+        self.submissions = self.create_submissions(3)
+        self.submissions[0].accept()
+        ReviewAssignment.objects.create(submission=self.submissions[1], user=self.reviewer, origin=ReviewAssignment.OPT_IN)
+        for i, submission in enumerate(self.submissions):
+            document = SupportingDocument(submission=submission, uploaded_by=self.submitter, description="Slides")
+            document.document.save("slides.txt", ContentFile(b"x" * (i + 1) * 1000))
+
+    def read(self, chunks):
+        return zipfile.ZipFile(BytesIO(b"".join(chunks)))
+
+    def test_archive(self):
+        archive = self.read(stream_archive(SupportingDocument.objects.for_archive()))
+        self.assertEqual(len(archive.namelist()), 3)
+        self.assertTrue(archive.namelist()[0].startswith(f"{self.submissions[0].number}/"))
+        self.assertEqual(archive.read(archive.namelist()[2]), b"x" * 3000)
+        self.assertIsNone(archive.testzip())
+
+    def test_archive_is_streamed(self):
+        chunks = list(stream_archive(SupportingDocument.objects.for_archive(), chunk_size=500))
+        self.assertGreater(len(chunks), 6)
+
+    def test_size_limit(self):
+        archive = self.read(stream_archive(SupportingDocument.objects.for_archive(), max_file_size=2000))
+        self.assertEqual(len(archive.namelist()), 3)
+        self.assertIn(b"over the 2000 byte limit", archive.read("SKIPPED.txt"))
+
+    def test_filters(self):
+        self.assertEqual(
+            [d.submission_id for d in SupportingDocument.objects.for_archive(status="accepted")],
+            [self.submissions[0].pk]
+        )
+        self.assertEqual(
+            [d.submission_id for d in SupportingDocument.objects.for_archive(reviewer=self.reviewer)],
+            [self.submissions[1].pk]
+        )
+
+    def test_assigned_view(self):
+        self.client.force_login(self.reviewer)
+        response = self.client.get(reverse("pinax_submissions:submission_document_archive"), {"assigned": "1"})
+        self.assertEqual(response["Content-Type"], "application/zip")
+        archive = self.read(response.streaming_content)
+        self.assertEqual(len(archive.namelist()), 1)
+
+    def test_view_requires_permission(self):
+        self.client.force_login(self.reviewer)
+        response = self.client.get(reverse("pinax_submissions:submission_document_archive"))
+        self.assertTemplateUsed(response, "pinax/submissions/access_not_permitted.html")
+
+    def test_command(self):
+        output = f"{self.media_root}/out.zip"
+        call_command("archive_documents", output, status="accepted", stdout=StringIO())
+        with zipfile.ZipFile(output) as archive:
+            self.assertEqual(len(archive.namelist()), 1)
+
+
+class CapabilitiesTests(Tests):
+
+    def setUp(self):
+        super().setUp()
+        content_type = ContentType.objects.create(app_label="reviews", model="review")
+        self.perm = Permission.objects.create(
+            content_type=content_type,
+            codename="can_review_submissions",
+            name="Can review submissions"
+        )
+        self.reviewer, = self.create_reviewers(1)
+        self.reviewers.permissions.add(self.perm)
+        self.client.force_login(self.reviewer)
+
+    def count_permission_lookups(self):
+        return mock.patch.object(
+            DefaultHookSet,
+            "user_permissions",
+            autospec=True,
+            side_effect=DefaultHookSet.user_permissions
+        )
+
+    def test_for_user(self):
+        capabilities = Capabilities.for_user(self.reviewer)
+        self.assertTrue(capabilities.can_review)
+        self.assertFalse(capabilities.can_manage)
+        chair = get_user_model().objects.create_superuser("chair", "chair@example.com", "password")
+        self.assertTrue(Capabilities.for_user(chair).can_manage)
+
+    def test_computed_once_per_request(self):
+        with self.count_permission_lookups() as lookups:
+            response = self.client.get(reverse("pinax_submissions:review_section"))
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.context["submission_capabilities"].can_review)
+        self.assertEqual(lookups.call_count, 1)
+
+    def test_access_not_permitted(self):
+        self.client.force_login(self.submitter)
+        response = self.client.get(reverse("pinax_submissions:review_section"))
+        self.assertTemplateUsed(response, "pinax/submissions/access_not_permitted.html")
+
+    def test_own_review_list(self):
+        self.client.force_login(self.submitter)
+        response = self.client.get(reverse("pinax_submissions:review_list_user", args=[self.submitter.pk]))
+        self.assertTemplateUsed(response, "pinax/submissions/review_list.html")
+
+    @override_settings(PINAX_SUBMISSIONS_CAPABILITIES_IN_SESSION=True)
+    def test_session_cache(self):
+        url = reverse("pinax_submissions:review_section")
+        with self.count_permission_lookups() as lookups:
+            self.client.get(url)
+            self.client.get(url)
+            self.assertEqual(lookups.call_count, 1)
+
+            self.reviewer.groups.remove(self.reviewers)
+            response = self.client.get(url)
+            self.assertEqual(lookups.call_count, 2)
+        self.assertTemplateUsed(response, "pinax/submissions/access_not_permitted.html")
+
+    @override_settings(PINAX_SUBMISSIONS_CAPABILITIES_IN_SESSION=True)
+    def test_session_cache_follows_user_flags(self):
+        url = reverse("pinax_submissions:review_section")
+        self.reviewer.groups.remove(self.reviewers)
+        self.assertTemplateUsed(self.client.get(url), "pinax/submissions/access_not_permitted.html")
+
+        version = hookset.permissions_version()
+        self.reviewer.last_login = timezone.now()
+        self.reviewer.save(update_fields=["last_login"])
+        self.reviewer.first_name = "Ada"
+        self.reviewer.save()
+        self.assertEqual(hookset.permissions_version(), version)
+
+        self.reviewer.is_superuser = True
+        self.reviewer.save()
+        self.assertTemplateUsed(self.client.get(url), "pinax/submissions/review_list.html")
+
+
+class SearchTests(Tests):
+
+    def setUp(self):
+        super().setUp()
+        self.reviewer, = self.create_reviewers(1)
+        self.talks = self.create_submissions(3)
+        self.talks[0].abstract = "Scaling Django with caching"
+        self.talks[0].save()
+        self.talks[1].abstract = "Caching, caching and more caching"
+        self.talks[1].save()
+        self.review = Review.objects.create(submission=self.talks[2], user=self.reviewer, comment="Needs a Postgres demo")
+        SubmissionMessage.objects.create(submission=self.talks[0], user=self.reviewer, message="Will you show Postgres?")
+
+    def assertFound(self, query, expected):
+        self.assertEqual(search_submissions(query), [talk.pk for talk in expected])
+
+    def test_default_backend(self):
+        self.assertIsInstance(get_backend(), SQLiteBackend)
+
+    def test_search(self):
+        self.assertFound("caching", [self.talks[1], self.talks[0]])
+        self.assertFound("Django CACHING", [self.talks[0]])
+        self.assertFound("postgres demo", [self.talks[2]])
+        self.assertFound("talk 1", [self.talks[1]])
+        self.assertFound("nothing", [])
+        self.assertFound("  ", [])
+
+    def test_updated_on_save_and_delete(self):
+        self.talks[1].abstract = "Templates"
+        self.talks[1].save()
+        self.assertFound("caching", [self.talks[0]])
+        self.review.delete()
+        self.assertFound("postgres", [self.talks[0]])
+        self.talks[0].delete()
+        self.assertFound("postgres", [])
+        self.assertFalse(SearchDocument.objects.filter(pk=self.talks[0].pk).exists())
+
+    def test_migration_backfills_documents(self):
+        migration = importlib.import_module("pinax.submissions.migrations.0011_backfill_search_documents")
+        documents = dict(SearchDocument.objects.values_list("pk", "text"))
+        SearchDocument.objects.exclude(pk=self.talks[1].pk).delete()
+        migration.backfill_search_documents(apps, None)
+        self.assertEqual(dict(SearchDocument.objects.values_list("pk", "text")), documents)
+
+    def test_rebuild(self):
+        SearchDocument.objects.all().delete()
+        self.assertFound("caching", [])
+        out = StringIO()
+        call_command("rebuild_search_index", batch_size=2, stdout=out)
+        self.assertIn("Indexed 3 submissions", out.getvalue())
+        self.assertFound("caching", [self.talks[1], self.talks[0]])
+
+    def test_view(self):
+        self.client.force_login(get_user_model().objects.create_superuser("chair", "chair@example.com", "password"))
+        response = self.client.get(reverse("pinax_submissions:submission_search"), {"q": "caching"})
+        self.assertEqual(list(response.context["submissions"]), [self.talks[1], self.talks[0]])
+        self.assertIsInstance(response.context["submissions"][0], TalkSubmission)
+
+    def test_view_access(self):
+        self.client.force_login(self.submitter)
+        response = self.client.get(reverse("pinax_submissions:submission_search"), {"q": "caching"})
+        self.assertTemplateUsed(response, "pinax/submissions/access_not_permitted.html")
+
+
+class PythonSearchTests(SearchTests):
+
+    def setUp(self):
+        self.backend = PythonBackend()
+        settings = override_settings(PINAX_SUBMISSIONS_SEARCH_BACKEND=self.backend)
+        settings.enable()
+        self.addCleanup(settings.disable)
+        super().setUp()
+
+    def test_default_backend(self):
+        self.assertIs(get_backend(), self.backend)
+
+    def test_reloads_after_other_process_updates(self):
+        self.assertFound("caching", [self.talks[1], self.talks[0]])
+        other = PythonBackend()
+        with override_settings(PINAX_SUBMISSIONS_SEARCH_BACKEND=other):
+            self.talks[0].abstract = "Templates"
+            self.talks[0].save()
+        self.assertFound("caching", [self.talks[1]])
+
+    def test_updated_on_commit(self):
+        self.assertFound("caching", [self.talks[1], self.talks[0]])
+        version = self.backend.current_version()
+        with mock.patch("django.db.transaction.on_commit") as on_commit:
+            self.talks[0].abstract = "Templates"
+            self.talks[0].save()
+        self.assertEqual(self.backend.current_version(), version)
+        self.assertFound("caching", [self.talks[1], self.talks[0]])
+        for (func,), kwargs in on_commit.call_args_list:
+            func()
+        self.assertNotEqual(self.backend.current_version(), version)
+        self.assertFound("caching", [self.talks[1]])
+
+
+class FacetTests(Tests):
+
+    def setUp(self):
+        super().setUp()
+        self.reviewer, self.other = self.create_reviewers(2)
+        self.tutorials = SubmissionKind.objects.create(name="Tutorial", slug="tutorial")
+        self.talks = self.create_submissions(3)
+        self.tutorial = TalkSubmission.objects.create(kind=self.tutorials, submitter=self.submitter, title="Tutorial")
+        self.talks[0].accept()
+        self.talks[1].cancel()
+        for talk in self.talks[:2]:
+            Review.objects.create(submission=talk, user=self.reviewer, comment="Good")
+        ReviewAssignment.objects.create(submission=self.talks[2], user=self.reviewer, origin=ReviewAssignment.OPT_IN)
+        ReviewAssignment.objects.create(submission=self.tutorial, user=self.other, origin=ReviewAssignment.OPT_IN, opted_out=True)
+
+    def search(self, query):
+        return FacetedSearch(SubmissionBase.objects.all(), QueryDict(query))
+
+    def counts(self, search):
+        return {
+            facet.name: {choice["value"]: choice["count"] for choice in choices}
+            for facet, choices in search.choices()
+        }
+
+    def assertFiltered(self, query, expected):
+        self.assertEqual(
+            list(self.search(query).filter().order_by("pk").values_list("pk", flat=True)),
+            sorted(submission.pk for submission in expected)
+        )
+
+    def test_filter(self):
+        self.assertFiltered("", self.talks + [self.tutorial])
+        self.assertFiltered("kind=tutorial", [self.tutorial])
+        self.assertFiltered("kind=talk&kind=tutorial&cancelled=no", [self.talks[0], self.talks[2], self.tutorial])
+        self.assertFiltered("status=accepted&status=standby", [self.talks[0]])
+        self.assertFiltered("status=undecided", self.talks[1:] + [self.tutorial])
+        self.assertFiltered("reviews=1-2", self.talks[:2])
+        self.assertFiltered("reviews=0&kind=talk", [self.talks[2]])
+        self.assertFiltered(f"reviewer={self.reviewer.pk}", [self.talks[2]])
+        self.assertFiltered(f"reviewer={self.other.pk}", [])
+
+    def test_unknown_values_are_ignored(self):
+        everything = self.talks + [self.tutorial]
+        for query in ["cancelled=bogus", "status=bogus", "reviews=9", "kind=bogus", "reviewer=bogus", "reviewer=999"]:
+            with self.subTest(query=query):
+                self.assertFiltered(query, everything)
+                self.assertEqual(self.search(query).querystring(), "")
+        self.assertFiltered("cancelled=bogus&cancelled=yes&kind=bogus&kind=talk", [self.talks[1]])
+
+    def test_counts_in_one_query(self):
+        search = self.search("")
+        with self.assertNumQueries(1):
+            counts = self.counts(search)
+        self.assertEqual(counts, {
+            "kind": {"talk": 3, "tutorial": 1},
+            "status": {"undecided": 3, "accepted": 1},
+            "cancelled": {"no": 3, "yes": 1},
+            "reviews": {"0": 2, "1-2": 2},
+            "reviewer": {str(self.reviewer.pk): 1},
+        })
+
+    def test_counts_ignore_own_selection(self):
+        counts = self.counts(self.search("kind=talk&reviews=0"))
+        self.assertEqual(counts["kind"], {"talk": 1, "tutorial": 1})
+        self.assertEqual(counts["reviews"], {"0": 1, "1-2": 2})
+        self.assertEqual(counts["status"], {"undecided": 1})
+
+    def test_view(self):
+        self.client.force_login(get_user_model().objects.create_superuser("chair", "chair@example.com", "password"))
+        response = self.client.get(reverse("pinax_submissions:review_section"), {"kind": "talk", "reviews": "1-2"})
+        submissions = list(response.context["object_list"])
+        self.assertEqual(submissions, self.talks[:2])
+        self.assertEqual(submissions[0].review_count, 1)
+        self.assertEqual(response.context["facet_query"], "kind=talk&reviews=1-2")
+        facet, kinds = response.context["facets"][0]
+        self.assertEqual(facet.name, "kind")
+        self.assertEqual([(choice["value"], choice["selected"]) for choice in kinds], [("talk", True)])
+
+
+class ReviewQueueTests(Tests):
+
+    def setUp(self):
+        super().setUp()
+        self.reviewer, self.other = self.create_reviewers(2)
+        self.talks = self.create_submissions(5)
+        for talk in self.talks:
+            ReviewAssignment.objects.create(submission=talk, user=self.reviewer, origin=ReviewAssignment.OPT_IN)
+        Review.objects.create(submission=self.talks[0], user=self.reviewer, comment="Done")
+        Review.objects.create(submission=self.talks[1], user=self.other, comment="Good")
+        Review.objects.create(submission=self.talks[1], user=self.other, comment="Still good")
+        Review.objects.create(submission=self.talks[2], user=self.other, comment="Fine")
+        self.talks[3].cancel()
+        ReviewAssignment.objects.filter(submission=self.talks[4]).update(opted_out=True)
+        self.late, = self.create_submissions(1)
+        ReviewAssignment.objects.create(submission=self.late, user=self.reviewer, origin=ReviewAssignment.OPT_IN)
+        self.own, = self.create_submissions(1, submitter=self.reviewer)
+        ReviewAssignment.objects.create(submission=self.own, user=self.reviewer, origin=ReviewAssignment.OPT_IN)
+
+    def test_queue(self):
+        queue = SubmissionBase.objects.review_queue(self.reviewer).select_subclasses()
+        self.assertEqual(list(queue), [self.late, self.talks[2], self.talks[1]])
+        self.assertEqual([submission.review_count for submission in queue], [0, 1, 2])
+        self.assertEqual(list(SubmissionBase.objects.review_queue(self.other)), [])
+
+    def test_assigned_to(self):
+        self.assertEqual(
+            set(SubmissionBase.objects.assigned_to(self.reviewer).select_subclasses()),
+            set(self.talks[:4] + [self.late, self.own])
+        )
+
+    def test_not_reviewed_by(self):
+        self.assertEqual(
+            set(SubmissionBase.objects.not_reviewed_by(self.other).select_subclasses()),
+            {self.talks[0], self.talks[3], self.talks[4], self.late, self.own}
+        )
+
+    def login(self):
+        content_type = ContentType.objects.create(app_label="reviews", model="review")
+        self.reviewers.permissions.add(Permission.objects.create(
+            content_type=content_type,
+            codename="can_review_submissions",
+            name="Can review submissions"
+        ))
+        self.client.force_login(self.reviewer)
+
+    def test_next(self):
+        self.login()
+        url = reverse("pinax_submissions:review_next")
+        self.client.get(url)  # warm the permissions cache
+        # session, user, queue
+        with self.assertNumQueries(3):
+            response = self.client.get(url)
+        self.assertRedirects(
+            response,
+            reverse("pinax_submissions:review_detail", args=[self.late.pk]),
+            fetch_redirect_response=False
+        )
+        for submission in [self.late, self.talks[2], self.talks[1]]:
+            Review.objects.create(submission=submission, user=self.reviewer, comment="Done")
+        response = self.client.get(url)
+        self.assertRedirects(response, reverse("pinax_submissions:review_assignments"), fetch_redirect_response=False)
+
+    def test_next_access(self):
+        self.client.force_login(self.reviewer)
+        response = self.client.get(reverse("pinax_submissions:review_next"))
+        self.assertTemplateUsed(response, "pinax/submissions/access_not_permitted.html")
+
+    def test_assignments_list(self):
+        self.login()
+        response = self.client.get(reverse("pinax_submissions:review_section_assignments"))
+        self.assertEqual(set(response.context["object_list"]), set(self.talks[:4] + [self.late, self.own]))
+        response = self.client.get(reverse("pinax_submissions:user_not_reviewed"))
+        self.assertNotIn(self.talks[0], response.context["object_list"])
+        self.assertNotIn(self.own, response.context["object_list"])
+
+
+class FragmentCacheTests(Tests):
+
+    def setUp(self):
+        super().setUp()
+        self.reviewer, = self.create_reviewers(1)
+        self.submission, self.other = self.create_submissions(2)
+        self.client.force_login(get_user_model().objects.create_superuser("chair", "chair@example.com", "password"))
+
+    def version(self):
+        return hookset.submission_versions([self.submission.pk])[self.submission.pk]
+
+    def assertBumped(self, change):
+        version, other = self.version(), hookset.submission_versions([self.other.pk])
+        change()
+        self.assertNotEqual(self.version(), version)
+        self.assertEqual(hookset.submission_versions([self.other.pk]), other)
+
+    def test_versions_are_stable(self):
+        self.assertEqual(self.version(), self.version())
+        versions = hookset.submission_versions([self.submission.pk, self.other.pk])
+        self.assertEqual(versions[self.submission.pk], self.version())
+        self.assertNotEqual(versions[self.submission.pk], versions[self.other.pk])
+
+    def test_bumped_on_changes(self):
+        self.assertBumped(lambda: self.submission.save())
+        self.assertBumped(lambda: Review.objects.create(submission=self.submission, user=self.reviewer, comment="Good"))
+        self.assertBumped(lambda: SubmissionMessage.objects.create(submission=self.submission, user=self.reviewer, message="Why?"))
+        self.assertBumped(lambda: Review.objects.filter(submission=self.submission).delete())
+        self.assertBumped(lambda: self.submission.accept())
+        self.assertBumped(lambda: SubmissionBase.objects.filter(pk=self.submission.pk).update_result("reject"))
+        self.assertBumped(lambda: ReviewAssignment.create_bulk_assignments([self.submission]))
+        assignment = ReviewAssignment.objects.get(submission=self.submission)
+        self.assertBumped(lambda: hookset.reassign(ReviewAssignment, assignment))
+        Review.objects.create(submission=self.submission, user=self.reviewer, comment="Good")
+        with self.settings(PINAX_SUBMISSIONS_MARKUP_RENDERER=str.upper):
+            self.assertBumped(lambda: call_command("rerender_markup", stdout=StringIO()))
+
+    def test_bumped_on_commit(self):
+        version = self.version()
+        with mock.patch("django.db.transaction.on_commit") as on_commit:
+            Review.objects.create(submission=self.submission, user=self.reviewer, comment="Good")
+        self.assertEqual(self.version(), version)
+        for (func,), kwargs in on_commit.call_args_list:
+            func()
+        self.assertNotEqual(self.version(), version)
+
+    def test_review_detail_fragment(self):
+        Review.objects.create(submission=self.submission, user=self.reviewer, comment="Good")
+        url = reverse("pinax_submissions:review_detail", args=[self.submission.pk])
+        self.assertContains(self.client.get(url), "reviewer0: <p>Good</p>")
+
+        # a queryset update doesn't bump the version, so the fragment is reused
+        Review.objects.update(comment_html="<p>Edited</p>")
+        self.assertContains(self.client.get(url), "reviewer0: <p>Good</p>")
+
+        SubmissionMessage.objects.create(submission=self.submission, user=self.reviewer, message="Why?")
+        response = self.client.get(url)
+        self.assertContains(response, "reviewer0: <p>Edited</p>")
+        self.assertContains(response, "reviewer0: <p>Why?</p>")
+
+    def test_review_list_fragments(self):
+        url = reverse("pinax_submissions:review_section")
+        self.assertContains(self.client.get(url), "Talk 0")
+
+        TalkSubmission.objects.update(title="Renamed")
+        response = self.client.get(url)
+        self.assertContains(response, "Talk 0")
+        self.assertContains(response, "Talk 1")
+
+        self.other.title = "Renamed"
+        self.other.save()
+        response = self.client.get(url)
+        self.assertContains(response, "Talk 0")
+        self.assertNotContains(response, "Talk 1")
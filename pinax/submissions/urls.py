@@ -12,6 +12,7 @@ urlpatterns = [
     url(r"^(?P<pk>\d+)/edit/$", views.SubmissionEdit.as_view(), name="submission_edit"),
     url(r"^(?P<pk>\d+)/cancel/$", views.SubmissionCancel.as_view(), name="submission_cancel"),
     url(r"^(\d+)/document/create/$", views.document_create, name="submission_document_create"),
+    url(r"^documents/archive/$", views.document_archive, name="submission_document_archive"),
     url(r"^document/(\d+)/delete/$", views.document_delete, name="submission_document_delete"),
     url(r"^document/(\d+)/([^/]+)$", views.document_download, name="submission_document_download"),
 
@@ -19,11 +20,16 @@ urlpatterns = [
     url(r"^reviewed/$", views.Reviews.as_view(), {"reviewed": "reviewed"}, name="user_reviewed"),
     url(r"^not-reviewed/$", views.Reviews.as_view(), {"reviewed": "not_reviewed"}, name="user_not_reviewed"),
     url(r"^assignments/$", views.Reviews.as_view(), {"assigned": True}, name="review_section_assignments"),
+    url(r"^next/$", views.review_next, name="review_next"),
+    url(r"^search/$", views.SubmissionSearch.as_view(), name="submission_search"),
     url(r"^list/(?P<user_pk>\d+)/$", views.ReviewList.as_view(), name="review_list_user"),
     url(r"^admin/$", views.ReviewAdmin.as_view(), name="review_admin"),
+    url(r"^results/$", views.review_bulk_result, name="review_bulk_result"),
+    url(r"^export/(?P<format>csv|ndjson)/$", views.submission_export, name="submission_export"),
     url(r"^notification/(?P<status>\w+)/$", views.result_notification, name="result_notification"),
     url(r"^notification/(?P<status>\w+)/prepare/$", views.result_notification_prepare, name="result_notification_prepare"),
     url(r"^notification/(?P<status>\w+)/send/$", views.result_notification_send, name="result_notification_send"),
+    url(r"^notification/progress/(?P<batch>\w+)/$", views.result_notification_progress, name="result_notification_progress"),
     url(r"^reviews/(?P<pk>\d+)/$", views.ReviewDetail.as_view(), name="review_detail"),
 
     url(r"^reviews/(?P<pk>\d+)/delete/$", views.ReviewDelete.as_view(), name="review_delete"),
@@ -1,7 +1,10 @@
+from django.db.models import QuerySet
 from django.http import Http404
-from django.shortcuts import render
+from django.shortcuts import get_object_or_404, render
 
-from .models import SubmissionResult
+from .hooks import hookset
+from .models import SubmissionBase, SubmissionResult
+from .permissions import get_capabilities
 
 
 class LoggedInMixin:
@@ -25,9 +28,9 @@ class CanReviewMixin:
     """
 
     def dispatch(self, request, *args, **kwargs):
-        if not request.user.has_perm("reviews.can_review_submissions"):
-            if not request.user.pk == self.kwargs["user_pk"]:
-                render(request, "pinax/submissions/access_not_permitted.html")
+        if not get_capabilities(request).can_review:
+            if str(request.user.pk) != str(self.kwargs.get("user_pk")):
+                return render(request, "pinax/submissions/access_not_permitted.html")
         return super().dispatch(request, *args, **kwargs)
 
 
@@ -38,17 +41,62 @@ class CanManageMixin:
     """
 
     def dispatch(self, request, *args, **kwargs):
-        if not request.user.has_perm("reviews.can_manage"):
-            render(request, "pinax/submissions/access_not_permitted.html")
+        if not get_capabilities(request).can_manage:
+            return render(request, "pinax/submissions/access_not_permitted.html")
         return super().dispatch(request, *args, **kwargs)
 
 
-def submissions_generator(request, queryset, user_pk=None):
-    for obj in queryset:
-        SubmissionResult.objects.get_or_create(submission=obj)
-        lookup_params = dict(submission=obj)
-        if user_pk:
-            lookup_params["user__pk"] = user_pk
-        else:
-            lookup_params["user"] = request.user
-        yield obj
+def get_submission_or_404(pk, queryset=None, **filters):
+    """
+    Fetch a submission as its concrete subclass in a single query.
+    """
+    if queryset is None:
+        queryset = SubmissionBase.objects.all()
+    return get_object_or_404(queryset.select_subclasses(), pk=pk, **filters)
+
+
+class SubmissionObjectMixin:
+    """
+    Mixin for views of a single submission: ``get_object`` fetches it as
+    its concrete subclass in one query, limited to the user's own
+    submissions unless ``submitter_only`` is false, and returns the same
+    instance for the rest of the request.
+
+    """
+
+    submitter_only = True
+
+    def get_submission_queryset(self):
+        return SubmissionBase.objects.select_related("kind", "result")
+
+    def get_object(self, queryset=None):
+        if not hasattr(self, "_submission"):
+            filters = {"submitter": self.request.user} if self.submitter_only else {}
+            self._submission = get_submission_or_404(
+                self.kwargs.get(self.pk_url_kwarg),
+                queryset=self.get_submission_queryset(),
+                **filters
+            )
+        return self._submission
+
+
+def submissions_generator(request, submissions, user_pk=None):
+    """
+    Yield ``submissions`` with their ``SubmissionResult`` in place, creating
+    any missing results in one INSERT, and their ``fragment_version`` (see
+    ``submission_versions``) read from the cache in one go.
+
+    """
+    if isinstance(submissions, QuerySet):
+        submissions = submissions.select_related("result")
+    submissions = list(submissions)
+    missing = [obj for obj in submissions if not hasattr(obj, "result")]
+    results = SubmissionResult.objects.bulk_create([
+        SubmissionResult(submission=obj) for obj in missing
+    ])
+    for obj, result in zip(missing, results):
+        obj.result = result
+    versions = hookset.submission_versions([obj.pk for obj in submissions])
+    for obj in submissions:
+        obj.fragment_version = versions[obj.pk]
+    yield from submissions
@@ -1,18 +1,19 @@
+import uuid
+
 from django.contrib import messages
 from django.contrib.auth import get_user_model
-from django.core.mail import send_mass_mail
-from django.db.models import Q
+from django.db.models import F, Prefetch, Q
+from django.db.models.functions import Coalesce
 from django.http import (
-    Http404,
-    HttpResponse,
     HttpResponseBadRequest,
     HttpResponseForbidden,
     HttpResponseNotAllowed,
+    JsonResponse,
+    StreamingHttpResponse,
 )
 from django.shortcuts import get_object_or_404, redirect, render
-from django.template import Context, Template
+from django.urls import reverse
 from django.utils.translation import ugettext_lazy as _
-from django.views import static
 from django.views.decorators.http import require_POST
 from django.views.generic import (
     DeleteView,
@@ -22,8 +23,11 @@ from django.views.generic import (
     UpdateView,
 )
 
-from .compat import login_required
+from .compat import login_required, url_has_allowed_host_and_scheme
 from .conf import settings
+from .documents import stream_archive
+from .export import FORMATS, export_rows
+from .facets import FacetedSearch
 from .forms import (
     ReviewForm,
     SubmitterCommentForm,
@@ -31,7 +35,9 @@ from .forms import (
 )
 from .hooks import hookset
 from .models import (
+    RESULT_STATUSES,
     NotificationTemplate,
+    QueuedEmail,
     ResultNotification,
     Review,
     ReviewAssignment,
@@ -40,7 +46,16 @@ from .models import (
     SubmissionMessage,
     SupportingDocument,
 )
-from .utils import CanReviewMixin, LoggedInMixin, submissions_generator
+from .pagination import KeysetPaginationMixin
+from .permissions import get_capabilities
+from .search import search_submissions
+from .utils import (
+    CanReviewMixin,
+    LoggedInMixin,
+    SubmissionObjectMixin,
+    get_submission_or_404,
+    submissions_generator,
+)
 
 
 class SubmissionKindList(LoggedInMixin, ListView):
@@ -98,32 +113,25 @@ class SubmissionAdd(LoggedInMixin, FormView):
         return self.render_to_response(context)
 
 
-class SubmissionEdit(LoggedInMixin, UpdateView):
+class SubmissionEdit(LoggedInMixin, SubmissionObjectMixin, UpdateView):
 
     template_name = "pinax/submissions/submission_edit.html"
 
     def get_success_url(self):
         return hookset.get_submission_edit_success_url(self.submission)
 
-    def get_object(self):
-        pk = self.kwargs.get(self.pk_url_kwarg, None)
-        submission = get_object_or_404(SubmissionBase, pk=pk)
-        submission = SubmissionBase.objects.get_subclass(pk=submission.pk)
-
-        if self.request.user != submission.submitter:
-            raise Http404()
-
-        if not submission.can_edit():
+    def dispatch(self, request, *args, **kwargs):
+        if request.user.is_authenticated and not self.get_object().can_edit():
             ctx = {
                 "title": "Submission editing closed",
                 "body": "Submission editing is closed for this session type."
             }
             return render(
-                self.request,
+                request,
                 "pinax/submissions/submission_error.html",
                 ctx
             )
-        return submission
+        return super().dispatch(request, *args, **kwargs)
 
     def get_form_class(self):
         return settings.PINAX_SUBMISSIONS_FORMS[self.get_object().kind.slug]
@@ -139,33 +147,33 @@ class SubmissionEdit(LoggedInMixin, UpdateView):
                 Q(submissionmessage__submission=self.submission)
             )
             users = users.exclude(pk=self.request.user.pk).distinct()
-            for user in users:
-                ctx = {
-                    "user": self.request.user,
-                    "submission": self.submission,
-                }
-                hookset.send_email(
-                    [user.email],
-                    "submission_updated",
-                    context=ctx
-                )
+            ctx = {
+                "user": self.request.user,
+                "submission": self.submission,
+            }
+            hookset.send_emails(
+                [([user.email], ctx) for user in users],
+                "submission_updated"
+            )
         messages.success(self.request, "Submission updated.")
         return redirect(self.get_success_url())
 
 
-class SubmissionDetail(LoggedInMixin, DetailView):
+class SubmissionDetail(LoggedInMixin, SubmissionObjectMixin, DetailView):
 
     template_name = "pinax/submissions/submission_detail.html"
 
-    def get_object(self, queryset=None):
-        pk = self.kwargs.get(self.pk_url_kwarg, None)
-        submission = get_object_or_404(
-            SubmissionBase,
-            pk=pk,
-            submitter=self.request.user
+    def get_submission_queryset(self):
+        return super().get_submission_queryset().prefetch_related(
+            Prefetch(
+                "supporting_documents",
+                queryset=SupportingDocument.objects.select_related("uploaded_by")
+            ),
+            Prefetch(
+                "messages",
+                queryset=SubmissionMessage.objects.select_related("user")
+            ),
         )
-        submission = SubmissionBase.objects.get_subclass(pk=submission.pk)
-        return submission
 
     def post(self, request, *args, **kwargs):
         self.object = self.get_object()
@@ -190,17 +198,15 @@ class SubmissionDetail(LoggedInMixin, DetailView):
             ).distinct().values_list("user", flat=True)
         )
 
-        for reviewer in reviewers:
-            ctx = {
-                "submission": submission,
-                "message": message,
-                "reviewer": True,
-            }
-            hookset.send_email(
-                [reviewer.email],
-                "submission_new_message",
-                context=ctx
-            )
+        ctx = {
+            "submission": submission,
+            "message": message,
+            "reviewer": True,
+        }
+        hookset.send_emails(
+            [([reviewer.email], ctx) for reviewer in reviewers],
+            "submission_new_message"
+        )
 
         return redirect(self.request.path)
 
@@ -212,26 +218,15 @@ class SubmissionDetail(LoggedInMixin, DetailView):
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        self.object = self.get_object()
         context["submission"] = self.object
         context["message_form"] = SubmitterCommentForm(instance=self.object)
         return context
 
 
-class SubmissionCancel(LoggedInMixin, DetailView):
+class SubmissionCancel(LoggedInMixin, SubmissionObjectMixin, DetailView):
 
     template_name = "pinax/submissions/submission_cancel.html"
 
-    def get_object(self, queryset=None):
-        pk = self.kwargs.get(self.pk_url_kwarg, None)
-        submission = get_object_or_404(
-            SubmissionBase,
-            pk=pk,
-            submitter=self.request.user
-        )
-        submission = SubmissionBase.objects.get_subclass(pk=submission.pk)
-        return submission
-
     def post(self, request, *args, **kwargs):
         submission = self.get_object()
         submission.cancel()
@@ -241,7 +236,6 @@ class SubmissionCancel(LoggedInMixin, DetailView):
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        self.object = self.get_object()
         context["submission"] = self.object
         return context
 
@@ -253,7 +247,7 @@ def access_not_permitted(request):
     return render(request, "pinax/submissions/access_not_permitted.html")
 
 
-class Reviews(LoggedInMixin, CanReviewMixin, ListView):
+class Reviews(LoggedInMixin, CanReviewMixin, KeysetPaginationMixin, ListView):
     """
     Returns a list of all proposals, proposals reviewed by the user, or the
     proposals the user has yet to review depending on the link user clicks in
@@ -265,54 +259,84 @@ class Reviews(LoggedInMixin, CanReviewMixin, ListView):
     assigned = False
     reviewed = "all"
     context_object_name = "submissions"
-    queryset = SubmissionBase.objects.all()
 
-    def get_context_data(self, **kwargs):
-        context = super().get_context_data(**kwargs)
-        queryset = self.queryset
+    def get_queryset(self):
+        queryset = SubmissionBase.objects.all()
 
-        if self.assigned:
-            assignments = ReviewAssignment.objects.filter(
-                user=self.request.user
-            ).values_list("submission__id")
-            queryset = queryset.filter(id__in=assignments)
+        if self.kwargs.get("assigned", self.assigned):
+            queryset = queryset.assigned_to(self.request.user)
+
+        reviewed = self.kwargs.get("reviewed", self.reviewed)
+        if reviewed == "reviewed":
+            queryset = queryset.reviewed_by(self.request.user)
+        elif reviewed == "not_reviewed":
+            queryset = queryset.not_reviewed_by(
+                self.request.user
+            ).exclude(submitter=self.request.user)
+
+        # filter before annotating: select_subclasses() only copies the last annotate() call
+        self.facets = FacetedSearch(queryset, self.request.GET)
+        queryset = self.facets.filter().with_review_stats(self.request.user)
+        return queryset.select_related("kind", "result").select_subclasses()
 
+    def get_context_data(self, **kwargs):
         # passing reviewed in from reviews.urls and out to review_list for
         # appropriate template header rendering
-        if self.reviewed == "all":
-            queryset = queryset.select_related("result").select_subclasses()
-            reviewed = "all_reviews"
-        elif self.reviewed == "reviewed":
-            queryset = queryset.filter(reviews__user=self.request.user)
-            reviewed = "user_reviewed"
-        else:
-            queryset = queryset.exclude(
-                reviews__user=self.request.user
-            ).exclude(submitter=self.request.user)
-            reviewed = "user_not_reviewed"
+        reviewed = {
+            "reviewed": "user_reviewed",
+            "not_reviewed": "user_not_reviewed",
+        }.get(self.kwargs.get("reviewed", self.reviewed), "all_reviews")
+        context = super().get_context_data(
+            reviewed=reviewed,
+            facets=self.facets.choices(),
+            facet_query=self.facets.querystring(),
+            **kwargs
+        )
+        context["submissions"] = submissions_generator(self.request, context["submissions"])
+        return context
+
 
-        submissions = submissions_generator(self.request, queryset)
+class SubmissionSearch(LoggedInMixin, CanReviewMixin, ListView):
+    """
+    The submissions matching the ``q`` query string, best matches first.
+    """
 
-        context["reviewed"] = reviewed
-        context["submissions"] = submissions
+    template_name = "pinax/submissions/submission_search.html"
+    context_object_name = "submissions"
 
-        return context
+    def get_queryset(self):
+        pks = search_submissions(self.request.GET.get("q", ""))
+        submissions = SubmissionBase.objects.filter(
+            pk__in=pks
+        ).select_related("kind", "result").select_subclasses()
+        rank = {pk: index for index, pk in enumerate(pks)}
+        return sorted(submissions, key=lambda submission: rank[submission.pk])
 
+    def get_context_data(self, **kwargs):
+        return super().get_context_data(query=self.request.GET.get("q", ""), **kwargs)
 
-class ReviewList(LoggedInMixin, CanReviewMixin, ListView):
+
+class ReviewList(LoggedInMixin, CanReviewMixin, KeysetPaginationMixin, ListView):
 
     template_name = "pinax/submissions/review_list.html"
     context_object_name = "submissions"
 
     def get_queryset(self):
-        queryset = SubmissionBase.objects.select_related("result")
+        queryset = SubmissionBase.objects.with_review_stats(self.request.user)
         reviewed = Review.objects.filter(
             user__pk=self.kwargs["user_pk"]
         ).values_list("submission", flat=True)
         queryset = queryset.filter(pk__in=reviewed)
-        submissions = queryset.order_by("submitted")
-        submissions = submissions_generator(self.request, submissions, user_pk=self.kwargs["user_pk"])
-        return submissions
+        return queryset.select_related("kind", "result").select_subclasses()
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context["submissions"] = submissions_generator(
+            self.request,
+            context["submissions"],
+            user_pk=self.kwargs["user_pk"]
+        )
+        return context
 
 
 class ReviewAdmin(LoggedInMixin, CanReviewMixin, ListView):
@@ -321,18 +345,20 @@ class ReviewAdmin(LoggedInMixin, CanReviewMixin, ListView):
     context_object_name = "reviewers"
 
     def get_queryset(self):
-        return hookset.reviewers()
+        # read from the materialized ReviewerStats, one LEFT JOIN on its pk
+        return hookset.reviewers().annotate(
+            assignment_count=Coalesce("reviewer_stats__assignment_count", 0),
+            review_count=Coalesce("reviewer_stats__review_count", 0),
+            outstanding_count=Coalesce("reviewer_stats__outstanding_count", 0),
+            opt_out_count=Coalesce("reviewer_stats__opt_out_count", 0),
+            average_turnaround=F("reviewer_stats__average_turnaround"),
+        )
 
 
-class ReviewDetail(LoggedInMixin, CanReviewMixin, DetailView):
+class ReviewDetail(LoggedInMixin, CanReviewMixin, SubmissionObjectMixin, DetailView):
 
     template_name = "pinax/submissions/review_detail.html"
-
-    def get_object(self, queryset=None):
-        pk = self.kwargs.get(self.pk_url_kwarg, None)
-        submissions = SubmissionBase.objects.select_related("result").select_subclasses()
-        submission = get_object_or_404(submissions, pk=pk)
-        return submission
+    submitter_only = False
 
     def post(self, request, *args, **kwargs):
         self.object = self.get_object()
@@ -341,11 +367,12 @@ class ReviewDetail(LoggedInMixin, CanReviewMixin, DetailView):
         if "message_submit" in request.POST:
             if message_form.is_valid():
                 return self.form_valid(message_form)
+            return self.form_invalid(message_form)
         elif "result_submit" in request.POST:
             if admin:
                 result = request.POST["result_submit"]
-                self.object.update_result(result)
-            return redirect(request.path)
+                self.object.update_result(result, user=request.user)
+        return redirect(request.path)
 
     def form_valid(self, form):
         message = form.save(commit=False)
@@ -355,24 +382,22 @@ class ReviewDetail(LoggedInMixin, CanReviewMixin, DetailView):
         return redirect(self.request.path)
 
     def form_invalid(self, form):
-        initial = {}
-        review_form = ReviewForm(initial=initial)
-        return self.render_to_response(
-            self.get_context_data(review_form=review_form))
+        return self.render_to_response(self.get_context_data(message_form=form))
 
     def get_context_data(self, **kwargs):
+        kwargs.setdefault("review_form", ReviewForm(initial={}))
+        kwargs.setdefault("message_form", SubmitterCommentForm())
         context = super().get_context_data(**kwargs)
-        submission = self.get_object()
-        reviews = Review.objects.filter(
-            submission=submission
-        ).order_by("-submitted_at")
-        messages = submission.messages.order_by("submitted_at")
-
+        submission = self.object
         context["submission"] = submission
-        context["reviews"] = reviews
-        context["review_messages"] = messages
-        context["review_form"] = ReviewForm(initial={})
-        context["message_form"] = SubmitterCommentForm()
+        # left unevaluated rather than prefetched, so they aren't queried when
+        # the template renders them from a cached fragment; on a miss each is
+        # one query with its users joined in
+        context["reviews"] = submission.reviews.select_related("user").order_by("-submitted_at")
+        context["review_messages"] = submission.messages.select_related("user").order_by("submitted_at")
+        context["documents"] = submission.supporting_documents.select_related("uploaded_by")
+        context["assignments"] = submission.reviewassignment_set.select_related("user").order_by("assigned_at")
+        context["fragment_version"] = hookset.submission_versions([submission.pk])[submission.pk]
         return context
 
 
@@ -403,37 +428,74 @@ class ReviewAssignments(LoggedInMixin, CanReviewMixin, DetailView):
 @require_POST
 def review_assignment_opt_out(request, pk):
     review_assignment = get_object_or_404(
-        ReviewAssignment,
+        ReviewAssignment.objects.select_related("submission__kind"),
         pk=pk,
         user=request.user
     )
     if not review_assignment.opted_out:
-        review_assignment.opted_out = True
-        review_assignment.save()
-        ReviewAssignment.create_assignments(
-            review_assignment.proposal,
-            origin=ReviewAssignment.AUTO_ASSIGNED_LATER
-        )
+        review_assignment.opt_out()
     return redirect("pinax_submissions:review_assignments")
 
 
+@login_required
+def review_next(request):
+    """
+    Redirect to the next submission in the user's review queue, or to their
+    assignments once there is none left.
+    """
+    if not get_capabilities(request).can_review:
+        return access_not_permitted(request)
+
+    pk = SubmissionBase.objects.review_queue(request.user).values_list("pk", flat=True).first()
+    if pk is None:
+        messages.info(request, _("There are no more submissions waiting for your review."))
+        return redirect("pinax_submissions:review_assignments")
+    return redirect("pinax_submissions:review_detail", pk)
+
+
+@login_required
+@require_POST
+def review_bulk_result(request):
+    if not get_capabilities(request).can_manage:
+        return access_not_permitted(request)
+
+    result = request.POST.get("result", "")
+    if result not in RESULT_STATUSES:
+        return HttpResponseBadRequest()
+    try:
+        submission_pks = [int(pk) for pk in request.POST.getlist("_selected_action")]
+    except ValueError:
+        return HttpResponseBadRequest()
+
+    changed = SubmissionBase.objects.filter(
+        pk__in=submission_pks
+    ).update_result(result, user=request.user)
+    messages.success(request, _("%(count)d submissions updated.") % {"count": changed})
+
+    next_url = request.POST.get("next", "")
+    if not url_has_allowed_host_and_scheme(next_url, allowed_hosts={request.get_host()}):
+        next_url = reverse("pinax_submissions:review_section")
+    return redirect(next_url)
+
+
 # RESULT NOTIFICATION VIEWS ###################################################
 
 
 @login_required
 def result_notification(request, status):
-    if not request.user.has_perm("reviews.can_manage"):
+    if not get_capabilities(request).can_manage:
         return access_not_permitted(request)
 
     submissions = SubmissionBase.objects.filter(
         result__status=status
-    ).select_related("result").select_subclasses()
+    ).select_related("result", "kind", "submitter").select_subclasses()
     notification_templates = NotificationTemplate.objects.all()
 
     return render(request, "pinax/submissions/result_notification.html", {
         "status": status,
         "submissions": submissions,
         "notification_templates": notification_templates,
+        "batch": request.GET.get("batch", ""),
     })
 
 
@@ -442,7 +504,7 @@ def result_notification_prepare(request, status):
     if request.method != "POST":
         return HttpResponseNotAllowed(["POST"])
 
-    if not request.user.has_perm("reviews.can_manage"):
+    if not get_capabilities(request).can_manage:
         return access_not_permitted(request)
 
     submission_pks = []
@@ -455,7 +517,7 @@ def result_notification_prepare(request, status):
         result__status=status,
     )
     submissions = submissions.filter(pk__in=submission_pks)
-    submissions = submissions.select_related("result")
+    submissions = submissions.select_related("result", "kind", "submitter")
     submissions = submissions.select_subclasses()
 
     notification_template_pk = request.POST.get("notification_template", "")
@@ -479,7 +541,7 @@ def result_notification_send(request, status):
     if request.method != "POST":
         return HttpResponseNotAllowed(["POST"])
 
-    if not request.user.has_perm("reviews.can_manage"):
+    if not get_capabilities(request).can_manage:
         return access_not_permitted(request)
 
     fields = ["submission_pks", "from_address", "subject", "body"]
@@ -506,26 +568,46 @@ def result_notification_send(request, status):
     else:
         notification_template = None
 
-    emails = []
-
-    for submission in submissions:
-        rn = ResultNotification()
-        rn.submission = submission
-        rn.template = notification_template
-        rn.to_address = submission.submitter.email
-        rn.from_address = request.POST["from_address"]
-        rn.subject = request.POST["subject"]
-        rn.body = Template(request.POST["body"]).render(
-            Context({
-                "submission": submission.notification_email_context()
-            })
-        )
-        rn.save()
-        emails.append(rn.email_args)
+    batch = uuid.uuid4().hex
+    count = ResultNotification.objects.send(
+        submissions.select_related("submitter", "kind"),
+        template=notification_template,
+        from_address=request.POST["from_address"],
+        subject=request.POST["subject"],
+        body=request.POST["body"],
+        batch=batch,
+    )
+
+    url = reverse("pinax_submissions:result_notification", kwargs={"status": status})
+    if not settings.PINAX_SUBMISSIONS_EMAIL_QUEUE:
+        # already delivered, so there is no progress to follow
+        messages.success(request, _("%(count)d notifications sent.") % {"count": count})
+        return redirect(url)
+    return redirect(f"{url}?batch={batch}")
+
+
+@login_required
+def result_notification_progress(request, batch):
+    """
+    The counts of the queued emails of ``batch`` by status; emails sent
+    without ``PINAX_SUBMISSIONS_EMAIL_QUEUE`` aren't tracked.
+    """
+    if not get_capabilities(request).can_manage:
+        return access_not_permitted(request)
+
+    return JsonResponse(QueuedEmail.objects.progress(batch))
 
-    send_mass_mail(emails)
 
-    return redirect("pinax_submissions:result_notification", status=status)
+@login_required
+def submission_export(request, format):
+    if not get_capabilities(request).can_manage:
+        return access_not_permitted(request)
+
+    content_type, writer = FORMATS[format]
+    rows = export_rows(chunk_size=settings.PINAX_SUBMISSIONS_EXPORT_CHUNK_SIZE)
+    response = StreamingHttpResponse(writer(rows), content_type=content_type)
+    response["Content-Disposition"] = f'attachment; filename="submissions.{format}"'
+    return response
 
 
 # DOCUMENT VIEWS #############################################################
@@ -533,8 +615,7 @@ def result_notification_send(request, status):
 
 @login_required
 def document_create(request, proposal_pk):
-    submission = get_object_or_404(SubmissionBase, pk=proposal_pk, submitter=request.user)
-    submission = SubmissionBase.objects.get_subclass(pk=submission.pk)
+    submission = get_submission_or_404(proposal_pk, submitter=request.user)
 
     if submission.cancelled:
         return HttpResponseForbidden()
@@ -559,16 +640,35 @@ def document_create(request, proposal_pk):
 @login_required
 def document_download(request, pk, *args):
     document = get_object_or_404(SupportingDocument, pk=pk)
-    if getattr(settings, "USE_X_ACCEL_REDIRECT", False):
-        response = HttpResponse()
-        response["X-Accel-Redirect"] = document.document.url
-        del response["content-type"]
+    return settings.PINAX_SUBMISSIONS_DOCUMENT_BACKEND.serve(request, document)
+
+
+@login_required
+def document_archive(request):
+    """
+    Stream a ZIP of the supporting documents of the submissions actively
+    assigned to the user (``?assigned=1``) or, for managers, of all
+    submissions, optionally only those with a given result ``status``.
+    """
+    if request.GET.get("assigned"):
+        reviewer = request.user
+    elif get_capabilities(request).can_manage:
+        reviewer = None
     else:
-        response = static.serve(
-            request,
-            document.document.name,
-            document_root=settings.MEDIA_ROOT
-        )
+        return access_not_permitted(request)
+
+    documents = SupportingDocument.objects.for_archive(
+        reviewer=reviewer,
+        status=request.GET.get("status")
+    )
+    response = StreamingHttpResponse(
+        stream_archive(
+            documents.iterator(),
+            max_file_size=settings.PINAX_SUBMISSIONS_DOCUMENT_ARCHIVE_MAX_FILE_SIZE
+        ),
+        content_type="application/zip"
+    )
+    response["Content-Disposition"] = 'attachment; filename="documents.zip"'
     return response
 
 
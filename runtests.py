@@ -9,8 +9,11 @@ from django.conf import settings
 
 DEFAULT_SETTINGS = dict(
     INSTALLED_APPS=[
+        "django.contrib.admin",
         "django.contrib.auth",
         "django.contrib.contenttypes",
+        "django.contrib.messages",
+        "django.contrib.sessions",
         "django.contrib.sites",
         "pinax.submissions",
         "pinax.submissions.tests"
@@ -21,7 +24,29 @@ DEFAULT_SETTINGS = dict(
             "NAME": ":memory:",
         }
     },
+    MIDDLEWARE=[
+        "django.contrib.sessions.middleware.SessionMiddleware",
+        "django.contrib.auth.middleware.AuthenticationMiddleware",
+        "django.contrib.messages.middleware.MessageMiddleware",
+        "pinax.submissions.permissions.CapabilitiesMiddleware",
+    ],
     SITE_ID=1,
+    TEMPLATES=[
+        {
+            "BACKEND": "django.template.backends.django.DjangoTemplates",
+            "APP_DIRS": True,
+            "OPTIONS": {
+                "context_processors": [
+                    "django.contrib.auth.context_processors.auth",
+                    "django.contrib.messages.context_processors.messages",
+                    "pinax.submissions.permissions.capabilities",
+                ],
+            },
+        }
+    ],
+    PINAX_SUBMISSIONS_FORMS={
+        "talk": "pinax.submissions.tests.forms.TalkSubmissionForm",
+    },
     ROOT_URLCONF="pinax.submissions.tests.urls",
     SECRET_KEY="notasecret",
 )
@@ -39,7 +64,7 @@ def runtests(*test_args):
     try:
         from django.test.runner import DiscoverRunner
         runner_class = DiscoverRunner
-        test_args = ["pinax.submissions.tests"]
+        test_args = test_args or ["pinax.submissions.tests"]
     except ImportError:
         from django.test.simple import DjangoTestSuiteRunner
         runner_class = DjangoTestSuiteRunner